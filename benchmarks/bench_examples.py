@@ -0,0 +1,46 @@
+"""Micro-benchmark of the diverse selection of examples in get_match_examples,
+compared to the previous pairwise removal loop.
+
+Usage:
+
+    python benchmarks/bench_examples.py
+
+"""
+
+import timeit
+from textx_dsldoc import render_utils
+
+
+REGEXES = ('.*', '[^\\n]*', '[a-zA-Z0-9_-]+', render_utils.SPECIAL_REGEXES['STRING'])
+
+
+def legacy_selection(matches:set, amount:int) -> set:
+    """The O(n²)-per-pass selection that was used before the similarity matrix"""
+    matches = set(matches)
+    similarity = render_utils.similarity
+    for similarity_threshold in (0.6, 0.5, 0.4, 0.3, 0.2, 0.1):
+        while amount and len(matches) > amount:
+            for one in set(matches):
+                for two in set(matches) - {one}:
+                    if similarity(one, two) >= 0.4:
+                        matches -= {two if len(one) > len(two) else one}
+                        break
+            else:  # no similarity found
+                break
+    return matches
+
+
+def bench(regex:str, amount:int=4, number:int=20) -> (float, float):
+    matches = render_utils.corpus_matches(regex)
+    render_utils.corpus_similarities()  # the matrix is built once per process
+    legacy = timeit.timeit(lambda: legacy_selection(matches, amount), number=number) / number
+    current = timeit.timeit(lambda: render_utils.diverse_examples(matches, amount), number=number) / number
+    return legacy, current
+
+
+if __name__ == '__main__':
+    print('regex'.ljust(30), 'matches', 'legacy (ms)'.rjust(12), 'matrix (ms)'.rjust(12), 'speedup'.rjust(8))
+    for regex in REGEXES:
+        legacy, current = bench(regex)
+        print(regex[:30].ljust(30), str(len(render_utils.corpus_matches(regex))).rjust(7),
+              f'{legacy*1000:12.3f}', f'{current*1000:12.3f}', f'{legacy/current:7.1f}x')
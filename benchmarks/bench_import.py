@@ -0,0 +1,46 @@
+"""Check the time needed to load the autodoc subcommand, as textx does
+at each invocation, using python -X importtime.
+
+Usage:
+
+    python benchmarks/bench_import.py [budget in ms]
+
+Exit with an error if the import takes more than the budget (default 25ms).
+click is imported beforehand, since textx already needs it.
+
+"""
+
+import sys
+import subprocess
+
+
+DEFAULT_BUDGET = 25  # ms
+MODULE = 'textx_dsldoc.textx_integration'
+
+
+def import_times(module:str=MODULE) -> [(str, int, int)]:
+    """Return (module, self µs, cumulative µs) of each module imported
+    when importing given one after click"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import click; import {module}'],
+                          stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    lines = proc.stderr.splitlines()
+    # keep only what is imported after click
+    start = max(idx for idx, line in enumerate(lines) if line.endswith('| click'))
+    times = []
+    for line in lines[start+1:]:
+        if not line.startswith('import time:') or 'self [us]' in line:  continue
+        selftime, cumulative, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(selftime), int(cumulative)))
+    return times
+
+
+if __name__ == '__main__':
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET
+    import_times()  # make sure bytecode is compiled, so it's not measured
+    times = import_times()
+    total = sum(selftime for _, selftime, _ in times) / 1000
+    for name, selftime, cumulative in sorted(times, key=lambda t: -t[1])[:10]:
+        print(f'{selftime/1000:8.2f}ms  {name}')
+    print(f'Importing {MODULE} takes {total:.2f}ms (budget: {budget}ms)')
+    if total > budget:
+        sys.exit(f'Import time budget exceeded by {total - budget:.2f}ms')
@@ -0,0 +1,50 @@
+"""Measure the memory held by the documentation sections of synthetic grammars.
+
+Usage:
+
+    python -m benchmarks.bench_memory [number of rules]…
+
+For each grammar, print the number of bytes allocated by doc_sections()
+per rule (sections, their IR and the interned strings), and the bytes of
+the section objects themselves (instances and their __dict__, if any).
+
+"""
+
+import sys
+import gc
+import tracemalloc
+from textx_dsldoc import rule_ir
+from textx_dsldoc.converters import doc_sections
+from .synthetic import synthetic_metamodel
+
+
+DEFAULT_RULES = (500, 2000)  # building bigger metamodels takes minutes
+
+
+def object_size(obj) -> int:
+    """Return the size of given object, including its __dict__ if any"""
+    return sys.getsizeof(obj) + (sys.getsizeof(obj.__dict__) if hasattr(obj, '__dict__') else 0)
+
+
+def sections_memory(rules:int) -> (int, int, int):
+    """Return the number of sections of a synthetic grammar of given number of rules,
+    the bytes allocated to build them, and the bytes of the section objects"""
+    metamodel = synthetic_metamodel(rules=rules, regex_terminals=rules // 10)
+    rule_ir.clear_caches()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sections = list(doc_sections(metamodel))
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    objects = sum(object_size(section) + (object_size(section.sequence) if section.sequence else 0)
+                  for section in sections)
+    return len(sections), allocated, objects
+
+
+if __name__ == '__main__':
+    for rules in map(int, sys.argv[1:]) if len(sys.argv) > 1 else DEFAULT_RULES:
+        nb, allocated, objects = sections_memory(rules)
+        print(f'{nb:6} sections: {allocated / nb:8.0f} bytes allocated per rule,'
+              f' {objects / nb:6.0f} bytes of section objects per rule')
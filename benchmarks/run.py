@@ -0,0 +1,124 @@
+"""Time each stage of the documentation of synthetic grammars and of the
+Laumio grammar of the examples, and write results in JSON.
+
+Usage:
+
+    python -m benchmarks.run --rules 50 --rules 500 -o results.json
+
+"""
+
+import os
+import sys
+import json
+import time
+import click
+import platform
+import tempfile
+import contextlib
+
+from textx_dsldoc import __version__, rule_ir, render_utils, regex_synthesis
+from textx_dsldoc.formats import Markdown, Html
+from textx_dsldoc.converters import doc_sections
+from textx_dsldoc.render_utils import get_match_examples
+from textx_dsldoc.render_metamodel import DocRegexSection
+from .synthetic import synthetic_metamodel
+
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+STAGES = ('load', 'sections', 'examples', 'markdown', 'html', 'write')
+
+
+def laumio_metamodel():
+    """Return the metamodel of examples/example.py, built again at each call"""
+    import textx
+    sys.path.insert(0, EXAMPLES_DIR)
+    try:
+        with contextlib.redirect_stdout(None):  # the example prints its classes
+            import example
+    finally:
+        sys.path.remove(EXAMPLES_DIR)
+    return textx.metamodel_from_str(example.GRAMMAR, classes=example.model_class.classes)
+
+
+def clear_caches():
+    """Forget everything computed by previous runs"""
+    rule_ir.clear_caches()
+    for func in (render_utils.compiled_regex, render_utils.corpus_matches,
+                 render_utils._get_match_examples, render_utils.corpus_similarities,
+                 render_utils.regex_match_examples, regex_synthesis.synthesized_examples):
+        func.cache_clear()
+
+
+def run_stages(load:callable) -> (dict, int):
+    """Return the time in seconds of each stage of the documentation of the
+    metamodel returned by given function, and the number of sections"""
+    clear_caches()
+    timings, start = {}, time.perf_counter()
+    def stage_done(name:str):
+        nonlocal start
+        now = time.perf_counter()
+        timings[name], start = now - start, now
+
+    metamodel = load()
+    stage_done('load')
+    sections = list(doc_sections(metamodel))
+    stage_done('sections')
+    for section in sections:
+        for regex in section.regexes:
+            get_match_examples(regex)
+        if isinstance(section, DocRegexSection):
+            get_match_examples(section.regex, amount=4)
+            get_match_examples(section.regex, amount=0)
+    stage_done('examples')
+    mkd = '\n'.join(line for section in sections for line in section.lines(Markdown))
+    stage_done('markdown')
+    html = '\n'.join(line for section in sections for line in section.lines(Html))
+    stage_done('html')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, content in (('out.md', mkd), ('out.html', html)):
+            with open(os.path.join(tmpdir, name), 'w') as fd:
+                fd.write(content)
+    stage_done('write')
+    return timings, len(sections)
+
+
+def benchmark(name:str, load:callable, params:dict, repeat:int=3) -> dict:
+    """Return the results of given number of runs, keeping the best time of each stage"""
+    runs = [run_stages(load) for _ in range(repeat)]
+    best = {stage: min(timings[stage] for timings, _ in runs) for stage in STAGES}
+    return {'name': name, 'params': params, 'sections': runs[0][1],
+            'stages': best, 'total': sum(best.values())}
+
+
+@click.command()
+@click.option('-r', '--rules', type=int, multiple=True, default=(50, 200),
+              help='number of rules of a synthetic grammar (can be repeated)')
+@click.option('-d', '--depth', type=int, default=2, help='maximal nesting of choices')
+@click.option('-w', '--choice-width', type=int, default=3, help='number of alternatives of choices')
+@click.option('-t', '--regex-terminals', type=float, default=0.2,
+              help='number of regex rules, as a ratio of the number of rules')
+@click.option('-s', '--separator-lists', type=float, default=0.3,
+              help='probability for an assignment to be a separated list')
+@click.option('-n', '--repeat', type=click.IntRange(min=1), default=3,
+              help='number of runs of each benchmark, the best one being kept')
+@click.option('-o', '--output', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='JSON file to write the results to')
+def main(rules, depth, choice_width, regex_terminals, separator_lists, repeat, output):
+    results = [benchmark('laumio', laumio_metamodel, {}, repeat)]
+    for nb_rules in rules:
+        params = {'rules': nb_rules, 'depth': depth, 'choice_width': choice_width,
+                  'regex_terminals': int(nb_rules * regex_terminals),
+                  'separator_lists': separator_lists}
+        load = lambda: synthetic_metamodel(**params)
+        results.append(benchmark(f'synthetic-{nb_rules}', load, params, repeat))
+    for result in results:
+        stages = '  '.join(f"{stage} {result['stages'][stage]*1000:8.1f}ms" for stage in STAGES)
+        print(f"{result['name']:>16} ({result['sections']:5} sections)  {stages}  total {result['total']*1000:8.1f}ms")
+    if output:
+        with open(output, 'w') as fd:
+            json.dump({'textx-dsldoc': __version__, 'python': platform.python_version(),
+                       'results': results}, fd, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Generation of synthetic textX grammars of tunable size and shape.
+
+"""
+
+import random
+
+
+TERMINAL_REGEXES = (
+    '[a-z]{{{}}}[a-z0-9_]*',
+    '[A-Z][a-z]{{{}}}',
+    '[0-9]{{{}}}-[0-9]{{2}}',
+    '0x[0-9a-f]{{{}}}',
+    '(yes|no|maybe|{})',
+    '[^"]{{{}}}',
+)
+BASE_TYPES = ('INT', 'ID', 'STRING', 'FLOAT', 'BOOL')
+
+
+def synthetic_grammar(rules:int=50, depth:int=2, choice_width:int=3, regex_terminals:int=10,
+                      separator_lists:float=0.3, seed:int=0) -> (str, [str]):
+    """Return a textX grammar and the names of its rules.
+
+    rules -- number of regular rules (in addition to the root Model)
+    depth -- maximal nesting of parenthesized choices in a rule
+    choice_width -- number of alternatives of each choice
+    regex_terminals -- number of rules matching a regex
+    separator_lists -- probability for an assignment to be a separated list (+=…[','])
+    seed -- seed of the random generator, making the grammar reproducible
+
+    Rules only reference rules defined after them, so the grammar
+    has no left recursion.
+
+    """
+    rng = random.Random(seed)
+    rules = max(1, rules)
+    names = [f'Rule{idx}' for idx in range(rules)]
+    terminals = [f'Terminal{idx}' for idx in range(regex_terminals)]
+    counter = iter(range(10**9))
+
+    def target(idx:int) -> str:
+        choices = names[idx+1:] + terminals
+        if not choices or rng.random() < 0.2:
+            return rng.choice(BASE_TYPES)
+        return rng.choice(choices)
+
+    def assignment(idx:int) -> str:
+        attr, dest = f'a{next(counter)}', target(idx)
+        if dest not in BASE_TYPES and rng.random() < separator_lists:
+            return f"{attr}+={dest}[',']"
+        return f'{attr}={dest}'
+
+    def expression(idx:int, depth:int) -> str:
+        if depth > 0 and rng.random() < 0.5:
+            return '(' + ' | '.join(expression(idx, depth - 1) for _ in range(choice_width)) + ')'
+        atoms = [f"'kw{next(counter)}'" if rng.random() < 0.4 else assignment(idx)
+                 for _ in range(rng.randint(1, 3))]
+        return ' '.join(atoms)
+
+    lines = [f'Model: items*={names[0]};']
+    for idx, name in enumerate(names):
+        lines.append(f"{name}: 'r{idx}' {expression(idx, depth)} {assignment(idx)};")
+    for idx, name in enumerate(terminals):
+        regex = TERMINAL_REGEXES[idx % len(TERMINAL_REGEXES)].format(idx % 7 + 1)
+        lines.append(f'{name}: value=/{regex}/;')
+    return '\n'.join(lines) + '\n', ['Model'] + names + terminals
+
+
+def synthetic_metamodel(**params):
+    """Return the metamodel of a synthetic grammar built with given parameters,
+    with a user class for each rule, so that they all get documented"""
+    import textx
+    grammar, names = synthetic_grammar(**params)
+    classes = [type(name, (), {}) for name in names]
+    return textx.metamodel_from_str(grammar, classes=classes)
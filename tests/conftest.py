@@ -0,0 +1,25 @@
+import pytest
+import textx
+
+
+GRAMMAR = r"""
+Model: items*=Item;
+Item: A | B;
+A: 'a' name=ID b=Bee;
+B: 'b' value=/[0-9]+x/;
+Bee: 'bee' x=INT;
+Dead: 'dead' other=Dead2;
+Dead2: 'dead2' n=ID;
+"""
+CLASSES = ('Model', 'A', 'B', 'Bee', 'Dead', 'Dead2')
+
+
+def metamodel_from(grammar:str, class_names:[str]):
+    """Return the metamodel of given grammar, with a user class for each given rule,
+    since textx only gives the classes it was given to metamodel.user_classes"""
+    return textx.metamodel_from_str(grammar, classes=[type(name, (), {}) for name in class_names])
+
+
+@pytest.fixture
+def metamodel():
+    return metamodel_from(GRAMMAR, CLASSES)
@@ -0,0 +1,44 @@
+import gzip
+import pytest
+from html.parser import HTMLParser
+from textx_dsldoc.converters import doc_sections
+from textx_dsldoc.textx_integration import write_documentation
+
+
+class TextOf(HTMLParser):
+    "Collect the words of a html document"
+    def __init__(self, document:str):
+        super().__init__()
+        self.words = []
+        self.feed(document)
+
+    def handle_data(self, data:str):
+        self.words.extend(data.split())
+
+
+def written(sections, output, **options) -> str:
+    files = write_documentation(sections, str(output), **options)
+    assert [path for path in files.paths if not path.endswith('.br')] == \
+        [str(output)] + ([str(output) + '.gz'] if options.get('compress') else [])
+    return output.read_text()
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_minified_and_compressed_outputs(metamodel, tmp_path, stream):
+    sections = list(doc_sections(metamodel))
+    plain = written(sections, tmp_path / 'plain.html')
+    minified = written(sections, tmp_path / 'doc.html', minify=True, compress=True, stream=stream)
+    assert len(minified) < len(plain)
+    assert TextOf(minified).words == TextOf(plain).words
+    assert gzip.decompress((tmp_path / 'doc.html.gz').read_bytes()).decode() == minified
+
+
+def test_brotli_output(metamodel, tmp_path):
+    brotli = pytest.importorskip('brotli')
+    minified = written(list(doc_sections(metamodel)), tmp_path / 'doc.html', minify=True, compress=True)
+    assert brotli.decompress((tmp_path / 'doc.html.br').read_bytes()).decode() == minified
+
+
+def test_markdown_is_not_minified(metamodel, tmp_path):
+    sections = list(doc_sections(metamodel))
+    assert written(sections, tmp_path / 'doc.md', minify=True) == written(sections, tmp_path / 'plain.md')
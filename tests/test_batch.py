@@ -0,0 +1,23 @@
+import click
+import pytest
+from textx_dsldoc.textx_integration import output_names, batch_index, autodoc_batch
+
+
+def test_output_names_are_distinct_from_the_index():
+    todo = [('target', 'a/index.tx'), ('target', 'b/grammar.tx'), ('target', 'c/Grammar.py'), ('language', 'Index')]
+    assert output_names(todo) == ['index-1', 'grammar', 'Grammar-1', 'Index-2']
+
+
+def test_index_escapes_names():
+    todo = [('language', '<b>&[x]')]
+    assert batch_index(todo, ['out/lang.html'], 'html') == '<p><a href="lang.html">&lt;b&gt;&amp;[x]</a></p>\n'
+    assert batch_index(todo, ['out/lang.md'], 'md') == '- [<b>&\\[x\\]](lang.md)\n'
+
+
+@pytest.mark.parametrize('language', ['textx', 'nope'])
+def test_unknown_languages_are_usage_errors(language, tmp_path):
+    with pytest.raises(click.UsageError, match=f'Unknown languages: {language}'):
+        autodoc_batch(targets=(), languages=(language,), all_languages=False, metamodel='metamodel',
+                      output_dir=str(tmp_path / 'out'), fmt='html', cache_dir=None, cache_size=None,
+                      jobs=1, regex_links='pythex')
+    assert not (tmp_path / 'out').exists()
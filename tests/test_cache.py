@@ -0,0 +1,91 @@
+import os
+from textx_dsldoc import cache
+from textx_dsldoc.cache import SectionsCache, FragmentCache, metamodel_files
+from textx_dsldoc.converters import doc_sections
+from textx_dsldoc.formats import Html
+from textx_dsldoc.textx_integration import load_sections, load_metamodel
+from conftest import GRAMMAR, CLASSES, metamodel_from
+
+
+PY_TARGET = """
+import os, textx
+metamodel = textx.metamodel_from_file(os.path.join({directory!r}, 'main.tx'), classes=[type('Model', (), {{}})])
+"""
+
+
+def write_python_target(directory) -> str:
+    (directory / 'main.tx').write_text("import base\nModel: items*=Base;\n")
+    (directory / 'base.tx').write_text("Base: 'base' name=ID;\n")
+    target = directory / 'target.py'
+    target.write_text(PY_TARGET.format(directory=str(directory)))
+    return str(target)
+
+
+def test_files_loaded_by_a_python_target(tmp_path):
+    target = write_python_target(tmp_path)
+    loaded = {os.path.basename(path) for path in metamodel_files(load_metamodel(target))}
+    assert loaded == {'main.tx', 'base.tx'}
+    files = set()
+    load_sections(target, files=files)
+    assert {os.path.basename(path) for path in files} == {'target.py', 'main.tx', 'base.tx'}
+
+
+def test_cached_sections_follow_the_loaded_grammars(tmp_path):
+    target = write_python_target(tmp_path)
+    cache_dir = str(tmp_path / 'cache')
+    before = load_sections(target, cache_dir=cache_dir)
+    assert [section.fingerprint for section in load_sections(target, cache_dir=cache_dir)] \
+        == [section.fingerprint for section in before]
+    (tmp_path / 'base.tx').write_text("Base: 'BASE' name=ID;\n")
+    after = load_sections(target, cache_dir=cache_dir)
+    assert 'BASE' in after[0].strings
+
+
+def test_sections_cache_checks_files(tmp_path):
+    grammar = tmp_path / 'grammar.tx'
+    grammar.write_text('A: "a";')
+    sections_cache = SectionsCache(str(tmp_path))
+    sections_cache.put('key', ['section'], [str(grammar)])
+    assert sections_cache.get('key') == (['section'], [str(grammar)])
+    grammar.write_text('A: "b";')
+    assert sections_cache.get('key') is None
+    assert sections_cache.get('unknown') is None
+
+
+def test_key_depends_on_sections_format(tmp_path, monkeypatch):
+    grammar = tmp_path / 'grammar.tx'
+    grammar.write_text('A: "a";')
+    key = SectionsCache.key_of(str(grammar))
+    monkeypatch.setattr(cache, 'SECTIONS_FORMAT', cache.SECTIONS_FORMAT + 1)
+    assert SectionsCache.key_of(str(grammar)) != key
+
+
+def rendered_again(fragments:FragmentCache, grammar:str, class_names:[str]) -> {str}:
+    """Render the sections of given grammar through given cache,
+    and return the names of those that were not in cache"""
+    rendered = set()
+    for section in doc_sections(metamodel_from(grammar, class_names)):
+        if section not in fragments:
+            rendered.add(section.name)
+        fragments.lines_of(section)
+    return rendered
+
+
+def test_only_changed_rules_and_their_users_are_rendered_again(tmp_path):
+    fragments = FragmentCache(str(tmp_path), Html)
+    assert rendered_again(fragments, GRAMMAR, CLASSES) == set(CLASSES)
+    assert rendered_again(fragments, GRAMMAR, CLASSES) == set()
+    changed = GRAMMAR.replace("Bee: 'bee'", "Bee: 'BEE'")
+    assert rendered_again(fragments, changed, CLASSES) == {'Bee'}
+    renamed = changed.replace('Bee', 'Bea')
+    assert rendered_again(fragments, renamed, [name.replace('Bee', 'Bea') for name in CLASSES]) == {'A', 'Bea'}
+    assert (fragments.hits, fragments.misses) == (6 + 5 + 4, 6 + 1 + 2)
+
+
+def test_fragments_depend_on_their_format(tmp_path, monkeypatch):
+    fragments = FragmentCache(str(tmp_path), Html)
+    section = next(doc_sections(metamodel_from(GRAMMAR, CLASSES)))
+    fragments.lines_of(section)
+    assert section in fragments
+    monkeypatch.setattr(cache, 'FRAGMENTS_FORMAT', cache.FRAGMENTS_FORMAT + 1)
+    assert section not in fragments
@@ -0,0 +1,58 @@
+import sys
+import click
+import pytest
+from textx_dsldoc.converters import doc_sections, gen_sections, render_in_parallel, section_lines, UnknownRuleError
+from textx_dsldoc.formats import Markdown, Html
+from textx_dsldoc.textx_integration import load_sections
+from conftest import metamodel_from
+
+
+def test_entries(metamodel):
+    names = [section.name for section in doc_sections(metamodel, entries=['Dead'])]
+    assert names == ['Dead', 'Dead2']
+
+
+def test_unknown_entries(metamodel):
+    with pytest.raises(UnknownRuleError, match='Nope'):
+        list(doc_sections(metamodel, entries=['Dead', 'Nope']))
+
+
+def test_unknown_entries_are_usage_errors(tmp_path):
+    target = tmp_path / 'grammar.tx'
+    target.write_text("Model: 'model' x=INT;")
+    with pytest.raises(click.UsageError):
+        load_sections(str(target), entries=['Nope'])
+
+
+def test_other_value_errors_are_not_usage_errors(tmp_path):
+    target = tmp_path / 'target.py'
+    target.write_text("raise ValueError('broken target')")
+    with pytest.raises(ValueError, match='broken target'):
+        load_sections(str(target))
+
+
+@pytest.mark.parametrize('fmt', [Markdown, Html])
+def test_parallel_rendering_keeps_the_order(metamodel, fmt):
+    sequential = list(gen_sections(metamodel, fmt=fmt))
+    assert list(gen_sections(metamodel, fmt=fmt, jobs=2)) == sequential
+    sections = list(doc_sections(metamodel))
+    assert list(render_in_parallel(sections, 3, fmt)) == [section_lines(section, fmt) for section in sections]
+
+
+def test_deep_chains_of_rules():
+    depth = 3000
+    grammar = '\n'.join(f"R{idx}: 'r{idx}' next=R{idx + 1};" for idx in range(depth)) + f"\nR{depth}: 'end' x=/[a-z]+/;"
+    names = [f'R{idx}' for idx in range(depth + 1)]
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(20 * depth)  # only textx needs it, to build the metamodel
+    try:
+        deep = metamodel_from(grammar, names)
+    finally:
+        sys.setrecursionlimit(limit)
+    assert depth > limit
+    for entries in ((), ('R0',)):
+        sections = list(doc_sections(deep, entries=entries))
+        assert [section.name for section in sections] == names
+        chunks = list(gen_sections(sections, fmt=Html))
+        assert len(chunks) == depth + 1
+        assert '<a href="#r1">R1</a>' in '\n'.join(chunks[0])
@@ -0,0 +1,92 @@
+import time
+import types
+import multiprocessing
+import pytest
+from textx_dsldoc import example_pool, render_utils
+from textx_dsldoc.converters import doc_sections, gen_sections
+from textx_dsldoc.example_pool import prefetch_examples, clear_prefetched
+from textx_dsldoc.formats import Html
+from conftest import metamodel_from
+
+
+def slow_examples_of(regex:str, amounts:[int]) -> {int: tuple}:
+    if regex == 'stuck':
+        time.sleep(60)
+    return {amount: ('example',) * amount for amount in amounts}
+
+
+@pytest.fixture
+def fake_examples(monkeypatch):
+    if multiprocessing.get_start_method() != 'fork':
+        pytest.skip("workers only see the patched function when forked")
+    monkeypatch.setattr(example_pool, 'examples_of', slow_examples_of)
+    yield
+    clear_prefetched()
+
+
+def test_only_stuck_regexes_time_out(fake_examples):
+    sections = [types.SimpleNamespace(regexes={regex}) for regex in ('stuck', 'a', 'b', 'c', 'd')]
+    start = time.monotonic()
+    with pytest.warns(UserWarning, match='stuck'):
+        timed_out = prefetch_examples(sections, timeout=1, workers=1)
+    assert timed_out == ['stuck']
+    assert time.monotonic() - start < 5
+    assert render_utils.TIMED_OUT_REGEXES == {'stuck'}
+    assert all(render_utils.PREFETCHED_EXAMPLES[regex, 3] == ('example',) * 3 for regex in 'abcd')
+
+
+def test_all_workers_stuck(fake_examples):
+    sections = [types.SimpleNamespace(regexes={regex}) for regex in ('stuck', 'a')]
+    with pytest.warns(UserWarning):
+        assert prefetch_examples(sections, timeout=0.5, workers=2) == ['stuck']
+    assert render_utils.PREFETCHED_EXAMPLES['a', 3] == ('example',) * 3
+
+
+def test_prefetched_examples_are_scoped_to_a_rendering(metamodel):
+    sections = list(doc_sections(metamodel))
+    assert any(section.regexes for section in sections)
+    list(gen_sections(sections, example_timeout=5, example_workers=1))
+    assert not render_utils.PREFETCHED_EXAMPLES
+    assert not render_utils.TIMED_OUT_REGEXES
+
+
+def test_pool_is_opt_in():
+    from textx_dsldoc.textx_integration import autodoc
+    option = next(param for param in autodoc.__click_params__ if param.name == 'example_timeout')
+    assert not option.default
+
+
+@pytest.fixture
+def timed_out():
+    yield render_utils.TIMED_OUT_REGEXES
+    render_utils.TIMED_OUT_REGEXES.clear()
+
+
+def test_timed_out_regexes_are_signaled_in_rules(metamodel, timed_out):
+    section = next(section for section in doc_sections(metamodel) if section.name == 'B')
+    assert 'Warning' not in '\n'.join(section.lines(Html))
+    timed_out.add('[0-9]+x')  # the rendering without warning is cached, but not used
+    rendered = '\n'.join(section.lines(Html))
+    assert '[0-9]+x' in rendered and '<em>Warning:</em> its examples could not be computed in time' in rendered
+    timed_out.clear()
+    assert 'Warning' not in '\n'.join(section.lines(Html))
+
+
+def test_local_links_dont_need_all_examples(monkeypatch):
+    from textx_dsldoc import render_metamodel
+    from textx_dsldoc.regex_tester import set_regex_links
+    section, = [section for section in doc_sections(metamodel_from("Ident: name=/[a-z]+/;", ['Ident']))]
+    amounts = []
+    def get_match_examples(regex, amount=3, seed=None):
+        amounts.append(amount)
+        return render_utils.get_match_examples(regex, amount, seed)
+    monkeypatch.setattr(render_metamodel, 'get_match_examples', get_match_examples)
+    set_regex_links('local')
+    try:
+        assert '#regex-' in '\n'.join(section.lines(Html))
+        assert 0 not in amounts
+        assert example_pool.example_requests([section]) == {'[a-z]+': {3, 4}}
+    finally:
+        set_regex_links('pythex')
+    list(section.lines(Html))
+    assert 0 in amounts
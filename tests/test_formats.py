@@ -0,0 +1,28 @@
+import textx
+from textx_dsldoc.converters import html_from_metamodel
+from textx_dsldoc.formats import Markdown, Html, format_of, minify_html
+
+
+def test_format_of():
+    assert format_of('doc/out.html') is Html
+    assert format_of('out.HTM') is Html
+    assert format_of('out.md') is Markdown
+    assert format_of('out.txt') is Markdown
+
+
+def test_minify_html():
+    assert minify_html('<ul>\n  <li>text\n</li>\n</ul>\n') == '<ul><li>text</li></ul>'
+
+
+def test_html_is_escaped():
+    grammar = r"""
+    Model: 'model' ops*=Op;
+    Op: '<=' left=INT | '&' right=/<[a-z]+>/;
+    """
+    classes = [type('Model', (), {'__doc__': 'Use <script> & co.'}), type('Op', (), {})]
+    out = html_from_metamodel(textx.metamodel_from_str(grammar, classes=classes))
+    assert '<script>' not in out and 'Use &lt;script&gt; &amp; co.' in out
+    assert '&lt;=' in out and '<=' not in out.replace('&lt;=', '')
+    assert '<code>/&lt;[a-z]+&gt;/</code>' in out
+    assert '&test_string=' not in out and '&amp;test_string=' in out  # in the href
+    assert '<a>' not in out and '<[a-z]' not in out
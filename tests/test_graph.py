@@ -0,0 +1,43 @@
+from textx_dsldoc.converters import doc_sections
+from textx_dsldoc.graph import reachable_classes, reference_graph
+from textx_dsldoc.render_metamodel import DocSection
+
+
+def test_reachable_from_root(metamodel):
+    names = [cls.__name__ for cls in reachable_classes([metamodel.rootcls])]
+    assert names[0] == 'Model'
+    assert {'A', 'B', 'Bee'} <= set(names)
+    assert not {'Dead', 'Dead2'} & set(names)
+
+
+def test_reachable_from_unused_rule(metamodel):
+    dead = metamodel.user_classes['Dead']
+    names = [cls.__name__ for cls in reachable_classes([dead])]
+    assert names[:2] == ['Dead', 'Dead2']  # then the base types they use
+    assert 'Model' not in names
+
+
+def test_reverse_graph(metamodel):
+    forward, reverse = reference_graph(metamodel.user_classes.values())
+    assert 'Bee' in forward['A']
+    assert reverse['Bee'] == {'A'}
+    assert reverse['Dead2'] == {'Dead'}
+
+
+def test_sections_are_built_as_consumed(metamodel, monkeypatch):
+    built = []
+    from_textx_class = DocSection.from_textx_class
+    def counting(textx_class):
+        built.append(textx_class.__name__)
+        return from_textx_class(textx_class)
+    monkeypatch.setattr(DocSection, 'from_textx_class', staticmethod(counting))
+    sections = doc_sections(metamodel)
+    assert not built
+    first = next(sections)
+    assert built == [first.name] == ['Model']
+    assert {section.name: section.names_in_parents for section in sections}['Bee'] == {'A'}
+
+
+def test_documented_classes(metamodel):
+    assert all(DocSection.documents(cls) == isinstance(DocSection.from_textx_class(cls), DocSection)
+               for cls in reachable_classes([metamodel.rootcls]))
@@ -0,0 +1,49 @@
+import os
+from textx_dsldoc.converters import doc_sections
+from textx_dsldoc.pages import page_of, page_names, rewrite_links, write_pages, INDEX_PAGE
+from conftest import metamodel_from
+
+
+CASE_GRAMMAR = """
+Model: Foo | FOO;
+Foo: 'foo' x=INT;
+FOO: 'FOO' y=INT;
+"""
+
+
+def test_page_of():
+    assert page_of('Model') == 'model.html'
+    assert page_of('Index') != INDEX_PAGE
+
+
+def test_page_names_differing_by_case():
+    pages = page_names(['Model', 'Foo', 'FOO', 'Index'])
+    assert pages['Model'] == 'model.html'
+    assert pages['Index'] not in {INDEX_PAGE, *(page for name, page in pages.items() if name != 'Index')}
+    assert pages['Foo'] != pages['FOO']
+    assert pages['Foo'].lower() != pages['FOO'].lower()
+    assert page_names(['FOO', 'Foo']) == {'Foo': pages['Foo'], 'FOO': pages['FOO']}  # stable
+
+
+def test_rewrite_links():
+    line = '<a href="#bee">Bee</a> <a href="#unknown">Unknown</a>'
+    assert rewrite_links(line, {'Bee': 'bee.html'}) == '<a href="bee.html">Bee</a> <a href="#unknown">Unknown</a>'
+
+
+def test_rewrite_links_differing_by_case():
+    pages = {'Foo': 'foo-1.html', 'FOO': 'foo-2.html'}
+    line = '<a href="#foo">FOO</a>, <a href="#foo">Foo</a>'
+    assert rewrite_links(line, pages) == '<a href="foo-2.html">FOO</a>, <a href="foo-1.html">Foo</a>'
+
+
+def test_rules_differing_by_case_get_their_own_page(tmp_path):
+    sections = list(doc_sections(metamodel_from(CASE_GRAMMAR, ['Model', 'Foo', 'FOO'])))
+    written, total = write_pages(sections, str(tmp_path))
+    assert written == total == 4  # the index and three rules
+    pages = page_names(['Model', 'Foo', 'FOO'])
+    for name in ('Foo', 'FOO'):
+        with open(os.path.join(str(tmp_path), pages[name])) as fd:
+            assert f'<h1 id="foo">{name}</h1>' in fd.read()
+    with open(os.path.join(str(tmp_path), pages['Model'])) as fd:
+        model = fd.read()
+    assert f'href="{pages["Foo"]}"' in model and f'href="{pages["FOO"]}"' in model
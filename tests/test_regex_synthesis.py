@@ -0,0 +1,18 @@
+import re
+import pytest
+from textx_dsldoc.regex_synthesis import synthesized_examples, MAX_CANDIDATES
+
+
+@pytest.mark.parametrize('regex', [
+    r'[0-9]+x', r'[a-z_][a-z0-9_]*', r'(ab|cd){2,3}', r'\d{4}-\d{2}', r'[^abc]+\.', r'\w+@\w+\.(com|org)',
+])
+def test_examples_match(regex):
+    examples = synthesized_examples(regex)
+    assert examples
+    assert len(examples) <= MAX_CANDIDATES
+    assert all(re.fullmatch(regex, example) for example in examples)
+    assert len(set(examples)) == len(examples)
+
+
+def test_unsatisfiable_regex():
+    assert synthesized_examples(r'a(?=b)') == ()
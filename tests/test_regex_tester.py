@@ -0,0 +1,46 @@
+import re
+import json
+import types
+import pytest
+from textx_dsldoc.converters import doc_sections
+from textx_dsldoc.regex_tester import set_regex_links, document_end, ASSET, ASSET_NAME
+from textx_dsldoc.render_utils import regex_id
+from textx_dsldoc.textx_integration import write_documentation
+
+
+@pytest.fixture
+def local_links():
+    set_regex_links('local')
+    yield
+    set_regex_links('pythex')
+
+
+def regex_table_of(document:str) -> dict:
+    return json.loads(re.search(r'<script type="application/json" id="regex-table">(.*?)</script>', document).group(1))
+
+
+def test_regexes_link_to_the_local_tester(metamodel, tmp_path, local_links):
+    output = tmp_path / 'doc.html'
+    write_documentation(list(doc_sections(metamodel)), str(output))
+    document = output.read_text()
+    assert 'pythex.org' not in document
+    assert f'href="#regex-{regex_id("[0-9]+x")}"' in document
+    entry = regex_table_of(document)[regex_id('[0-9]+x')]
+    assert entry['regex'] == '[0-9]+x'
+    assert entry['examples'] and all(re.fullmatch('[0-9]+x', example) for example in entry['examples'])
+    assert (tmp_path / ASSET_NAME).read_text() == ASSET
+
+
+def test_regex_table_cant_close_its_script(local_links):
+    end = document_end([types.SimpleNamespace(regexes={'</script>'})])
+    assert end[0].count('</script>') == 1
+    assert regex_table_of('\n'.join(end))[regex_id('</script>')]['regex'] == '</script>'
+
+
+def test_pythex_links_are_the_default(metamodel, tmp_path):
+    output = tmp_path / 'doc.html'
+    write_documentation(list(doc_sections(metamodel)), str(output))
+    assert 'pythex.org' in output.read_text() and 'regex-table' not in output.read_text()
+    assert not (tmp_path / ASSET_NAME).exists()
+    with pytest.raises(ValueError):
+        set_regex_links('elsewhere')
@@ -0,0 +1,41 @@
+import sys
+import pickle
+import pytest
+from textx_dsldoc import rule_ir
+from textx_dsldoc.converters import doc_sections
+from conftest import metamodel_from
+
+
+GRAMMAR = r"""
+Model: 'model' firsts+=First seconds+=Second;
+First: 'first' names+=ID[','] size=/[0-9]+kb/;
+Second: 'second' names+=ID[','] size=/[0-9]+kb/;
+"""
+
+
+@pytest.fixture
+def sections():
+    return {section.name: section for section in doc_sections(metamodel_from(GRAMMAR, ['Model', 'First', 'Second']))}
+
+
+def test_sections_are_slotted(sections):
+    for section in sections.values():
+        assert not hasattr(section, '__dict__')
+        assert not hasattr(section.sequence, '__dict__')
+        with pytest.raises(AttributeError):
+            section.undeclared = True
+
+
+def test_names_and_nodes_are_shared(sections):
+    assert sections['First'].name is sys.intern(''.join(['Fir', 'st']))
+    first, second = (rule_ir.sequence_items(sections[name].sequence.ir) for name in ('First', 'Second'))
+    assert first[0] is not second[0]  # 'first' and 'second'
+    assert all(one is other for one, other in zip(first[1:], second[1:]))
+    assert first[2][1] is second[2][1]  # the regex string itself
+
+
+def test_unpickled_sections_are_interned(sections):
+    section = pickle.loads(pickle.dumps(sections['First']))
+    assert section.name is sections['First'].name
+    assert section.sequence.ir is sections['First'].sequence.ir
+    assert next(iter(section.names_in_parents)) is sections['Model'].name
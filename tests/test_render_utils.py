@@ -0,0 +1,36 @@
+from itertools import combinations
+from textx_dsldoc import render_utils
+from textx_dsldoc.render_utils import (get_match_examples, regex_match_examples, corpus_matches,
+                                       _get_match_examples, diverse_examples, similarity)
+
+
+def test_examples_are_cached_by_regex_amount_and_seed():
+    _get_match_examples.cache_clear()
+    first = get_match_examples('[0-9]+', amount=2)
+    assert get_match_examples('[0-9]+', amount=2) == first
+    assert _get_match_examples.cache_info().hits == 1
+    get_match_examples('[0-9]+', amount=3)
+    get_match_examples('[0-9]+', amount=2, seed=1)
+    assert _get_match_examples.cache_info().misses == 3
+    get_match_examples('[0-9]+', amount=2, seed=1)
+    assert _get_match_examples.cache_info().hits == 2
+
+
+def test_corpus_is_scanned_once():
+    regex_match_examples.cache_clear()
+    corpus_matches.cache_clear()
+    for regex in ('[a-z]+', '[0-9]+', '[A-Z_0-9]+', '[a-z]+'):
+        assert all(example in regex_match_examples() for example in corpus_matches(regex))
+    assert regex_match_examples.cache_info().misses == 1
+    assert corpus_matches.cache_info().misses == 3
+    assert render_utils.REGEX_MATCH_EXAMPLES is regex_match_examples()
+
+
+def test_diverse_examples_spread_their_picks():
+    candidates = sorted(corpus_matches(r'\w+'), key=lambda e: (-len(e), e))
+    picks = diverse_examples(candidates, 3)
+    assert len(set(picks)) == 3 and set(picks) <= set(candidates)
+    closest = lambda examples: max(similarity(one, two) for one, two in combinations(examples, 2))
+    assert closest(picks) < closest(candidates[:3])
+    assert len({pick.lower() for pick in picks}) == 3  # not the same word in another case
+    assert diverse_examples(candidates, 3, seed=4) == diverse_examples(candidates, 3, seed=4)
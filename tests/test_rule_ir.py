@@ -0,0 +1,45 @@
+from textx_dsldoc import rule_ir
+from textx_dsldoc.converters import doc_sections
+from textx_dsldoc.server import DocServer
+from conftest import metamodel_from
+
+
+def test_interned_nodes_are_unique():
+    node = rule_ir.interned('sequence', (rule_ir.interned('str', 'a'), rule_ir.interned('rule', 'B')))
+    assert rule_ir.interned('sequence', (('str', 'a'), ('rule', 'B'))) is node
+    rule_ir.clear_caches()
+    assert not rule_ir.INTERNED_NODES
+
+
+def test_reloads_forget_previous_nodes(metamodel, tmp_path):
+    grammar = tmp_path / 'grammar.tx'
+    grammar.write_text('')
+    server = DocServer(lambda: list(doc_sections(metamodel)), lambda: [str(grammar)], interval=0, echo=lambda _: None)
+    stale = rule_ir.interned('rule', 'RemovedRule')
+    server.mtimes = {}  # as if the grammar was modified
+    server.check_grammar()
+    assert stale not in rule_ir.INTERNED_NODES
+    assert server.sections  # the new version is loaded
+
+
+def test_other_rules_are_referenced_not_described(metamodel):
+    sections = {section.name: section for section in doc_sections(metamodel)}
+    assert sections['A'].references == {'Bee'}
+    assert sections['A'].sequence.ir == rule_ir.interned('sequence', (
+        rule_ir.interned('str', 'a'), rule_ir.interned('special regex', 'ID'), rule_ir.interned('rule', 'Bee')))
+    assert sections['Bee'].names_in_parents == {'A'}
+
+
+def test_ir_size_doesnt_grow_with_used_rules():
+    size = 100
+    grammar = '\n'.join(f"R{idx}: 'r{idx}' next=R{idx + 1};" for idx in range(size)) + f"\nR{size}: 'end' x=INT;"
+    sections = list(doc_sections(metamodel_from(grammar, [f'R{idx}' for idx in range(size + 1)])))
+    assert len(sections) == size + 1
+    assert max(len(repr(section.sequence.ir)) for section in sections) < 100
+
+
+def test_recursive_rules():
+    grammar = "Expr: '(' inner=Expr ')' | value=INT;"
+    section, = doc_sections(metamodel_from(grammar, ['Expr']))
+    assert section.references == {'Expr'}
+    assert 'Expr' in ''.join(section.lines())
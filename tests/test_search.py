@@ -0,0 +1,39 @@
+import json
+from textx_dsldoc.converters import gen_sections
+from textx_dsldoc.formats import Html
+from textx_dsldoc.search import SearchIndex, index_script
+from conftest import metamodel_from
+
+
+GRAMMAR = r"""
+Model: 'model' rules*=Rule;
+Rule: 'when' cond=Cond 'then' action=ID;
+Cond: left=ID op='>=' right=/[0-9]+kg/;
+"""
+DOCS = {'Cond': 'Compare a weight to a threshold.'}
+
+
+def index_of(grammar:str, docs:{str: str}) -> (dict, [str]):
+    metamodel = metamodel_from(grammar, ['Model', 'Rule', 'Cond'])
+    for name, doc in docs.items():
+        metamodel[name].__doc__ = doc
+    index = SearchIndex('doc.search.js')
+    lines = [line for lines in gen_sections(metamodel, fmt=Html, search_index=index) for line in lines]
+    script = index.as_script()
+    assert script.startswith('window.DSLDOC_SEARCH=') and script.endswith(';\n')
+    return json.loads(script[len('window.DSLDOC_SEARCH='):-2]), lines
+
+
+def test_index_contents():
+    index, lines = index_of(GRAMMAR, DOCS)
+    assert index['docs'] == [['Model', '#model'], ['Rule', '#rule'], ['Cond', '#cond']]
+    docs_of = lambda term: {index['docs'][doc][0] for doc in index['terms'][term]}
+    assert docs_of('model') == {'Model'}
+    assert docs_of('when') == docs_of('then') == {'Rule'}
+    assert docs_of('weight') == docs_of('threshold') == {'Cond'}  # from the docstring
+    assert docs_of('>=') == docs_of('[0-9]+kg') == {'Cond'}  # searched as a whole
+    assert 'data-index="doc.search.js"' in '\n'.join(lines)  # the widget ends the document
+
+
+def test_index_script_is_next_to_the_output():
+    assert index_script('out/doc.html') == 'out/doc.search.js'
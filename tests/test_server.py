@@ -0,0 +1,126 @@
+import time
+import asyncio
+import multiprocessing
+import click
+import pytest
+from textx_dsldoc import example_pool, render_utils
+from textx_dsldoc.converters import doc_sections
+from textx_dsldoc.server import DocServer
+
+
+def make_server(metamodel, tmp_path, **options) -> DocServer:
+    grammar = tmp_path / 'grammar.tx'
+    grammar.write_text('')
+    return DocServer(lambda: list(doc_sections(metamodel)), lambda: [str(grammar)],
+                     interval=0, echo=lambda _: None, **options)
+
+
+def test_pages_and_etags(metamodel, tmp_path):
+    server = make_server(metamodel, tmp_path)
+    status, headers, body = server.respond('/', set())
+    assert status == 200 and b'href="bee.html"' in body
+    status, headers, body = server.respond('/bee.html', set())
+    assert status == 200 and b'<h1 id="bee">Bee</h1>' in body
+    assert b'href="a.html"' in body  # used by A, on its own page
+    status, _, body = server.respond('/bee.html', {headers['ETag']})
+    assert status == 304 and body == b''
+    assert server.respond('/unknown.html', set())[0] == 404
+
+
+def test_unchanged_rules_keep_their_etag(metamodel, tmp_path):
+    server = make_server(metamodel, tmp_path)
+    etag = server.respond('/bee.html', set())[1]['ETag']
+    server.mtimes = {}  # as if the grammar was modified
+    assert server.respond('/bee.html', {etag})[0] == 304
+
+
+def test_missing_grammar_keeps_the_pages(metamodel, tmp_path):
+    server = make_server(metamodel, tmp_path)
+    (tmp_path / 'grammar.tx').unlink()  # as done by editors saving with a rename
+    assert server.respond('/bee.html', set())[0] == 200
+
+
+def request(server:DocServer, path:str) -> bytes:
+    """Return the raw http response of given server to a GET of given path"""
+    async def run():
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+            response = await reader.read()
+            writer.close()
+            return response
+    return asyncio.run(run())
+
+
+def test_rendering_errors_are_answered(metamodel, tmp_path, monkeypatch):
+    server = make_server(metamodel, tmp_path)
+    assert request(server, '/bee.html').startswith(b'HTTP/1.1 200 OK\r\n')
+    def failing(_):
+        raise RuntimeError('rendering failed')
+    monkeypatch.setattr(server, 'lines_of', failing)
+    response = request(server, '/a.html')
+    assert response.startswith(b'HTTP/1.1 500 Internal Server Error\r\n')
+    assert b'rendering failed' in response
+
+
+def stuck_examples_of(regex:str, amounts:[int]) -> {int: tuple}:
+    time.sleep(60)
+
+
+def test_slow_regexes_do_not_hold_the_server(metamodel, tmp_path, monkeypatch):
+    if multiprocessing.get_start_method() != 'fork':
+        pytest.skip("workers only see the patched function when forked")
+    monkeypatch.setattr(example_pool, 'examples_of', stuck_examples_of)
+    server = make_server(metamodel, tmp_path, example_timeout=0.5, example_workers=1)
+    start = time.monotonic()
+    with pytest.warns(UserWarning):
+        status, _, body = server.respond('/b.html', set())
+    assert status == 200 and time.monotonic() - start < 5
+    assert render_utils.TIMED_OUT_REGEXES == {'[0-9]+x'}
+    server.mtimes = {}  # reloading forgets the verdicts
+    server.check_grammar()
+    assert not render_utils.TIMED_OUT_REGEXES
+
+
+def test_degraded_renderings_are_not_kept(metamodel, tmp_path, monkeypatch):
+    if multiprocessing.get_start_method() != 'fork':
+        pytest.skip("workers only see the patched function when forked")
+    monkeypatch.setattr(example_pool, 'examples_of', stuck_examples_of)
+    server = make_server(metamodel, tmp_path, example_timeout=0.5, example_workers=1)
+    try:
+        with pytest.warns(UserWarning):
+            status, headers, body = server.respond('/b.html', set())
+        assert status == 200 and b'<em>Warning:</em>' in body
+        assert server.sections['b.html'].fingerprint not in server.rendered
+        degraded = headers['ETag']
+        server.mtimes = {}  # once reloaded, the examples are computed by new workers
+        status, headers, body = server.respond('/b.html', {degraded})
+        assert status == 200 and b'Warning' not in body and headers['ETag'] != degraded
+        assert server.respond('/b.html', {headers['ETag']})[0] == 304
+    finally:
+        server.close()
+
+
+def test_example_workers_are_started_with_the_server(metamodel, tmp_path):
+    server = make_server(metamodel, tmp_path, example_timeout=5, example_workers=1)
+    pool = server.examples.pool
+    assert pool is not None  # before any thread is started
+    assert server.respond('/b.html', set())[0] == 200
+    assert server.examples.pool is pool
+    server.close()
+    assert server.examples.pool is None
+
+
+@pytest.mark.parametrize('option, value', [('search', True), ('minify', True), ('compress', True),
+                                           ('pages_dir', 'pages'), ('jobs', 2), ('profile', True),
+                                           ('stream', True)])
+def test_serve_rejects_unsupported_options(option, value, tmp_path):
+    from textx_dsldoc.textx_integration import autodoc
+    grammar = tmp_path / 'grammar.tx'
+    grammar.write_text("Model: 'model' x=INT;")
+    options = {param.name: param.default for param in autodoc.__click_params__}
+    options.update(target=str(grammar), serve=True, port=0, **{option: value})
+    with pytest.raises(click.UsageError, match="can't be used with --serve"):
+        autodoc(**options)
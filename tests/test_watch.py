@@ -0,0 +1,125 @@
+import os
+import click
+import pytest
+from textx_dsldoc.converters import doc_sections
+from textx_dsldoc.textx_integration import autodoc
+from textx_dsldoc.watch import update_rendering
+
+
+def test_only_changed_sections_are_rendered_again(metamodel):
+    sections = list(doc_sections(metamodel))
+    rendered, nb = update_rendering(sections, {})
+    assert nb == len(rendered) == len({section.name for section in sections})
+    again, nb = update_rendering(sections, rendered)
+    assert nb == 0
+    assert all(again[name] is rendered[name] for name in rendered)
+    rendered['Bee'] = ('outdated fingerprint', ['outdated'])
+    again, nb = update_rendering(sections, rendered)
+    assert nb == 2  # Bee, and A that references it
+    assert again['Bee'][1] != ['outdated']
+    assert again['A'] is not rendered['A'] and again['Model'] is rendered['Model']
+
+
+def test_removed_rules_are_forgotten(metamodel):
+    sections = list(doc_sections(metamodel))
+    rendered, _ = update_rendering(sections, {})
+    rendered['Removed'] = ('fingerprint', ['lines'])
+    again, _ = update_rendering(sections, rendered)
+    assert 'Removed' not in again
+
+
+class Stop(Exception):
+    pass
+
+
+def rewrite(path, content:str):
+    """Write given content in given file, with a new modification time
+    even on file systems with coarse timestamps"""
+    mtime = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(content)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+def run_watch(target, output, steps:list, monkeypatch, **options) -> [str]:
+    """Run watch on given target, calling the given functions between two
+    checks of the grammar, then stop. Return the messages of watch."""
+    from textx_dsldoc import watch as watch_module
+    steps = iter(steps)
+    def sleep(_):
+        try:
+            next(steps)()
+        except StopIteration:
+            raise Stop
+    monkeypatch.setattr(watch_module.time, 'sleep', sleep)
+    messages = []
+    try:
+        watch_module.watch(str(target), str(output), echo=messages.append, **options)
+    except Stop:
+        pass
+    return messages
+
+
+def test_watch_survives_a_missing_grammar(tmp_path, monkeypatch):
+    grammar, output = tmp_path / 'grammar.tx', tmp_path / 'out.md'
+    grammar.write_text("Model: 'model' x=INT;")
+    saved = []
+    def remove():  # as done by editors saving with a rename
+        saved.append(grammar.read_text())
+        grammar.unlink()
+    def restore():
+        rewrite(grammar, saved[0].replace('model', 'edited'))
+    messages = run_watch(grammar, output, [remove, restore, lambda: None], monkeypatch)
+    assert any(message.startswith("Can't document") for message in messages)
+    assert 'edited' in output.read_text()
+
+
+def test_watch_survives_a_rendering_error(tmp_path, monkeypatch):
+    from textx_dsldoc import watch as watch_module
+    grammar, output = tmp_path / 'grammar.tx', tmp_path / 'out.md'
+    grammar.write_text("Model: 'model' x=INT;")
+    original = watch_module.update_rendering
+    def failing(*args, **kwargs):
+        raise RuntimeError('rendering failed')
+    def break_rendering():
+        monkeypatch.setattr(watch_module, 'update_rendering', failing)
+        rewrite(grammar, "Model: 'broken' x=INT;")
+    def fix_rendering():
+        monkeypatch.setattr(watch_module, 'update_rendering', original)
+        rewrite(grammar, "Model: 'fixed' x=INT;")
+    messages = run_watch(grammar, output, [break_rendering, fix_rendering, lambda: None], monkeypatch)
+    assert "Can't document" in ' '.join(messages) and 'rendering failed' in ' '.join(messages)
+    assert 'fixed' in output.read_text()
+
+
+def test_watch_documents_only_reachable_rules(tmp_path, monkeypatch):
+    from conftest import GRAMMAR, CLASSES
+    target, output = tmp_path / 'target.py', tmp_path / 'out.md'
+    target.write_text(f"""import textx
+metamodel = textx.metamodel_from_str({GRAMMAR!r}, classes=[type(name, (), {{}}) for name in {CLASSES!r}])
+""")
+    run_watch(target, output, [], monkeypatch, reachable_only=True)
+    assert '# Bee' in output.read_text()
+    assert 'Dead' not in output.read_text()
+
+
+def test_watch_uses_the_cache_dir(tmp_path, monkeypatch):
+    grammar, output, cache_dir = tmp_path / 'grammar.tx', tmp_path / 'out.md', tmp_path / 'cache'
+    grammar.write_text("Model: 'model' x=INT;")
+    run_watch(grammar, output, [], monkeypatch, cache_dir=str(cache_dir))
+    assert os.listdir(str(cache_dir / 'sections')) and os.listdir(str(cache_dir / 'fragments'))
+    cached = output.read_text()
+    output.unlink()
+    run_watch(grammar, output, [], monkeypatch, cache_dir=str(cache_dir))
+    assert output.read_text() == cached
+
+
+@pytest.mark.parametrize('option, value', [('search', True), ('minify', True), ('compress', True),
+                                           ('pages_dir', 'pages'), ('jobs', 2), ('profile', True),
+                                           ('profile_json', 'profile.json'), ('stream', True)])
+def test_watch_rejects_unsupported_options(option, value, tmp_path):
+    grammar = tmp_path / 'grammar.tx'
+    grammar.write_text("Model: 'model' x=INT;")
+    options = {param.name: param.default for param in autodoc.__click_params__}
+    options.update(target=str(grammar), output=str(tmp_path / 'out.md'), watch_target=True, **{option: value})
+    with pytest.raises(click.UsageError, match="can't be used with --watch"):
+        autodoc(**options)
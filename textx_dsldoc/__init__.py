@@ -1,3 +1,10 @@
 __version__ = '0.0.2.dev0'
 
-from .textx_integration import autodoc
+
+def __getattr__(name:str):
+    # importing the textx integration is deferred until needed, since the package
+    #  is loaded by every textx invocation to register the subcommands.
+    if name == 'autodoc':
+        from .textx_integration import autodoc
+        return autodoc
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,73 @@
+"""Writing of the documentation file, and of its minified and compressed versions.
+
+The compressed siblings (.gz, and .br if the brotli module is available)
+are written from the same stream of chunks as the documentation file,
+so that static file servers can send them directly.
+
+"""
+
+import os
+import gzip
+from .formats import minify_html
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class OutputFiles:
+    """Context manager writing the chunks given to write() in given output
+    file, optionally minified, and in its compressed siblings."""
+
+    def __init__(self, output:str, *, minify:bool=False, compress:bool=False):
+        self.output = output
+        self.minify = bool(minify)
+        self.compress = bool(compress)
+        self.raw_size = 0  # size of the chunks before minification, in bytes
+        self.paths = [output]
+        if compress:
+            self.paths.append(output + '.gz')
+        if compress and brotli:
+            self.paths.append(output + '.br')
+
+    def __enter__(self):
+        self._fd = open(self.output, 'w')
+        self._gzip = self._brotli = None
+        if self.compress:
+            self._gzip = gzip.GzipFile(os.path.basename(self.output), 'wb', compresslevel=9,
+                                       fileobj=open(self.output + '.gz', 'wb'), mtime=0)
+        if self.compress and brotli:
+            self._brotli = brotli.Compressor(quality=11), open(self.output + '.br', 'wb')
+        return self
+
+    def write(self, chunk:str):
+        self.raw_size += len(chunk.encode())
+        if self.minify:
+            chunk = minify_html(chunk)
+        self._fd.write(chunk)
+        if self._gzip or self._brotli:
+            data = chunk.encode()
+            if self._gzip:  self._gzip.write(data)
+            if self._brotli:  self._brotli[1].write(self._brotli[0].process(data))
+
+    def flush(self):
+        self._fd.flush()
+
+    def __exit__(self, *_):
+        self._fd.close()
+        if self._gzip:
+            fileobj = self._gzip.fileobj
+            self._gzip.close()  # doesn't close the file it was given
+            fileobj.close()
+        if self._brotli:
+            compressor, fd = self._brotli
+            fd.write(compressor.finish())
+            fd.close()
+
+    def report(self) -> [str]:
+        """Yield the human-readable size of written files, and what they save"""
+        for path in self.paths:
+            size = os.path.getsize(path)
+            saved = 1 - size / self.raw_size if self.raw_size else 0.
+            yield f"{path}: {size / 1024:.1f} kB ({saved:.0%} saved)"
@@ -0,0 +1,205 @@
+"""On-disk caching of rendered documentation and of extracted grammars,
+allowing incremental rebuilds.
+
+"""
+
+import os
+import re
+import pickle
+import hashlib
+import tempfile
+from . import __version__
+from .render_utils import TIMED_OUT_REGEXES
+
+
+# default bound of the size of a cache directory, in bytes
+DEFAULT_CACHE_SIZE = 100 * 2**20
+# version of the pickled sections, to bump when DocSection or the IR change
+SECTIONS_FORMAT = 3
+# version of the rendered fragments, to bump when the rendering changes
+#  in a way the section fingerprints don't capture (formats, templates…)
+FRAGMENTS_FORMAT = 1
+
+
+class FragmentCache:
+    """Keep the rendering of each DocSection in given format in a directory,
+    indexed by the section fingerprint, so that only the sections that changed
+    since last run are rendered again.
+
+    """
+
+    def __init__(self, cache_dir:str, fmt:type):
+        self.fmt = fmt
+        self.directory = os.path.join(cache_dir, 'fragments')
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits, self.misses = 0, 0
+
+    def path_of(self, section) -> str:
+        return os.path.join(self.directory, f'{section.fingerprint}-{FRAGMENTS_FORMAT}{self.fmt.extension}')
+
+    def __contains__(self, section) -> bool:
+        return os.path.exists(self.path_of(section))
+
+    def get(self, section) -> [str] or None:
+        """Return the lines of given section, or None if not in cache"""
+        path = self.path_of(section)
+        if not os.path.exists(path):
+            self.misses += 1
+            return
+        self.hits += 1
+        os.utime(path)  # mark it as recently used
+        with open(path) as fd:
+            return fd.read().split('\n')
+
+    def put(self, section, lines:[str]):
+        if section.regexes & TIMED_OUT_REGEXES:
+            return  # rendered without some examples, better luck next time
+        write_atomically(self.path_of(section), '\n'.join(lines))
+
+    def lines_of(self, section) -> [str]:
+        """Return the lines of given section, rendering it only if
+        not already in cache"""
+        lines = self.get(section)
+        if lines is None:
+            lines = list(section.lines(self.fmt))
+            self.put(section, lines)
+        return lines
+
+
+class SectionsCache:
+    """Keep the DocSection extracted from a grammar in a directory, indexed
+    by a hash of the target files and of the textx and textx-dsldoc versions,
+    so that the metamodel doesn't have to be built when the grammar didn't change.
+
+    The grammar files loaded by a python target are only known once
+    the metamodel is built: they are stored with the sections, and checked
+    before the sections are returned.
+
+    """
+
+    def __init__(self, cache_dir:str):
+        self.directory = os.path.join(cache_dir, 'sections')
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_of(self, key:str) -> str:
+        return os.path.join(self.directory, key + '.pickle')
+
+    def get(self, key:str) -> (list, [str]) or None:
+        """Return the sections stored under given key and the grammar files
+        they were extracted from, or None if not in cache or if one of these files changed"""
+        path = self.path_of(key)
+        try:
+            with open(path, 'rb') as fd:
+                sections, files = pickle.load(fd)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError, TypeError):
+            return  # not in cache, or written by an incompatible version
+        if any(file_digest(file) != digest for file, digest in files.items()):
+            return
+        os.utime(path)  # mark it as recently used
+        return sections, list(files)
+
+    def put(self, key:str, sections:list, files:[str]=()):
+        """Store given sections under given key, with the grammar files they were
+        extracted from"""
+        files = {file: file_digest(file) for file in files}
+        write_atomically(self.path_of(key), pickle.dumps((list(sections), files)))
+
+    @staticmethod
+    def key_of(target:str, *args) -> str:
+        """Return the key of sections extracted from given target file,
+        with given additional parameters (like the name of the metamodel)"""
+        hasher = hashlib.sha1(repr((SECTIONS_FORMAT, __version__, textx_version()) + args).encode())
+        for path in grammar_files(target):
+            hasher.update(path.encode())
+            with open(path, 'rb') as fd:
+                hasher.update(fd.read())
+        return hasher.hexdigest()
+
+
+def grammar_files(target:str) -> [str]:
+    """Yield given file, and, if it's a textx grammar, the grammars it imports"""
+    seen, stack = set(), [os.path.abspath(target)]
+    while stack:
+        path = stack.pop()
+        if path in seen or not os.path.exists(path):  continue
+        seen.add(path)
+        yield path
+        if path.endswith('.tx'):
+            with open(path) as fd:
+                imports = re.findall(r'^\s*import\s+([\w.]+)', fd.read(), flags=re.MULTILINE)
+            # textx resolves the imports relatively to the grammar directory
+            stack.extend(os.path.join(os.path.dirname(path), *name.split('.')) + '.tx' for name in imports)
+
+
+def file_mtimes(paths:[str]) -> {str: int or None}:
+    """Return the modification time of given files, None for those that don't exist
+    (like a file being replaced by an editor)"""
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+
+def metamodel_files(metamodel) -> [str]:
+    """Yield the grammar file given metamodel was built from, if any,
+    and the grammars it imports"""
+    if getattr(metamodel, 'file_name', None):
+        yield from grammar_files(metamodel.file_name)
+
+
+def file_digest(path:str) -> str or None:
+    """Return the hash of given file content, or None if it doesn't exist"""
+    try:
+        with open(path, 'rb') as fd:
+            return hashlib.sha1(fd.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def textx_version() -> str:
+    try:
+        import textx
+        return getattr(textx, '__version__', None) or _installed_version('textX')
+    except ImportError:
+        return ''
+
+
+def _installed_version(package:str) -> str:
+    try:
+        from importlib import metadata
+    except ImportError:  # python < 3.8
+        import pkg_resources
+        return pkg_resources.get_distribution(package).version
+    return metadata.version(package)
+
+
+def evict(cache_dir:str, max_size:int=DEFAULT_CACHE_SIZE):
+    """Remove the least recently used files of given cache directory
+    until its total size is below given number of bytes"""
+    files = []
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_size:  break
+        os.remove(path)
+        total -= size
+
+
+def write_atomically(path:str, content:str or bytes):
+    """Write given content in given file, so that a concurrent reader
+    never sees a partially written file"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(content, bytes) else 'w') as out:
+            out.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
@@ -1,28 +1,165 @@
 """Definitions of high-level converters/compilers.
 
+All converters accept either a metamodel or the sections extracted
+from it by doc_sections(), and the options of gen_sections as keyword arguments.
+
 """
 
-import markdown
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from . import profiling
+from .cache import FragmentCache
+from .formats import Markdown, Html
+from .graph import reference_graph, reachable_classes
 from .render_metamodel import DocSection
+from . import render_utils
+from .example_pool import prefetch_examples, prefetched_state, install_state, clear_prefetched
+from .regex_tester import document_end, set_regex_links
 
 
-def markdown_from_metamodel(metamodel) -> str:
+def markdown_from_metamodel(metamodel, **options) -> str:
     """Return string containing markdown describing the auto-generated documentation
     of given metamodel."""
-    return '\n'.join(gen_lines(metamodel))
+    return '\n'.join(gen_lines(metamodel, **options))
 
 
-def html_from_metamodel(metamodel) -> str:
+def html_from_metamodel(metamodel, **options) -> str:
     """Return string containing html describing the auto-generated documentation
     of given metamodel."""
-    return markdown.markdown(markdown_from_metamodel(metamodel))
+    return '\n'.join(gen_lines(metamodel, fmt=Html, **options))
+
+
+def markdown_chunks(metamodel, **options) -> [str]:
+    """Yield the markdown describing given metamodel, one section at a time"""
+    return gen_chunks(metamodel, **options)
+
+
+def html_chunks(metamodel, **options) -> [str]:
+    """Yield the html describing given metamodel, one section at a time"""
+    return gen_chunks(metamodel, fmt=Html, **options)
+
+
+def gen_chunks(metamodel, **options) -> [str]:
+    """Yield the documentation of given metamodel, one section at a time,
+    so that the whole document never has to be held in memory.
+
+    The concatenation of the chunks is the output of markdown_from_metamodel
+    (or html_from_metamodel if fmt is formats.Html).
+
+    """
+    for idx, lines in enumerate(gen_sections(metamodel, **options)):
+        yield ('\n' if idx else '') + '\n'.join(lines)
+
+
+def gen_lines(metamodel, **options) -> [str]:
+    "Yield lines describing classes found in given metamodel"
+    for lines in gen_sections(metamodel, **options):
+        yield from lines
+
+
+def gen_sections(metamodel, *, fmt:type=Markdown, cache_dir:str=None, jobs:int=1,
+                 example_timeout:float=None, example_workers:int=None, search_index=None) -> [[str]]:
+    """Yield, for each documented class of given metamodel, its lines in given format.
+
+    fmt -- the output format, one of formats.Markdown or formats.Html.
+    cache_dir -- if given, the rendering of each section is kept in it,
+                 and only sections whose fingerprint changed are rendered again.
+    jobs -- number of processes rendering the sections. The sections
+            are yielded in the same order whatever the number of jobs.
+    example_timeout -- if given, examples of all regexes are computed before rendering
+                       by a pool of `example_workers` processes, each regex
+                       being rendered without examples if they take more than
+                       that number of seconds. Otherwise, they are computed
+                       during rendering, without limit.
+    search_index -- if given, a search.SearchIndex fed with the sections
+                    as they are rendered, its search box ending the document.
+
+    """
+    cache = FragmentCache(cache_dir, fmt) if cache_dir else None
+    sections = metamodel if isinstance(metamodel, (list, tuple)) else doc_sections(metamodel)
+    if example_timeout or render_utils.REGEX_LINKS == 'local':
+        sections = list(sections)  # they are needed before or after the rendering
+    try:
+        if example_timeout:
+            todo = [section for section in sections if not cache or section not in cache]
+            prefetch_examples(todo, timeout=example_timeout, workers=example_workers)
+        if jobs > 1:
+            sections = list(sections)
+            for section, lines in zip(sections, render_in_parallel(sections, jobs, fmt, cache)):
+                if search_index:  search_index.add(section)
+                yield lines
+        else:
+            for section in sections:
+                with profiling.stage(fmt.name), profiling.rule(section.name):
+                    lines = cache.lines_of(section) if cache else section_lines(section, fmt)
+                if search_index:  search_index.add(section)
+                yield lines
+        end = document_end(sections) + (search_index.widget_lines() if search_index else [])
+        if end:
+            yield end
+    finally:
+        if example_timeout:  clear_prefetched()  # only valid for this rendering
+
+
+class UnknownRuleError(ValueError):
+    "Raised when asked to document from a rule that is not in the metamodel"
+
+
+def doc_sections(metamodel, *, reachable_only:bool=False, entries:[str]=()) -> [DocSection]:
+    """Yield the sections documenting classes found in given metamodel,
+    each knowing the documented rules referencing it.
+
+    reachable_only -- document only the rules reachable from the root rule
+                      (or from the entries), in breadth-first order.
+                      Other rules are not even examined.
+    entries -- names of the rules to start from (implies reachable_only).
+               UnknownRuleError is raised if one of them is not a rule of the metamodel.
+
+    """
+    classes = list(dict.fromkeys([metamodel.rootcls] + list(metamodel.user_classes.values())))
+    if reachable_only or entries:
+        with profiling.stage('reachability'):
+            starts = [metamodel.rootcls]
+            if entries:
+                by_name = {cls.__name__: cls for cls in reachable_classes(classes)}
+                unknown = [name for name in entries if name not in by_name]
+                if unknown:
+                    raise UnknownRuleError(f"Unknown rules: {', '.join(unknown)}")
+                starts = [by_name[name] for name in entries]
+            documented = set(classes) | set(starts)
+            classes = [cls for cls in reachable_classes(starts) if cls in documented]
+    with profiling.stage('reference graph'):
+        _, used_by = reference_graph(classes)
+    documented = frozenset(cls.__name__ for cls in classes if DocSection.documents(cls))
+    for cls in classes:  # sections are built as they are consumed
+        with profiling.stage('IR build'):
+            section = DocSection.from_textx_class(cls)
+        if isinstance(section, DocSection):
+            section.names_in_parents = used_by.get(section.name, frozenset()) & documented
+            yield section
+
+
+def section_lines(section:DocSection, fmt:type=Markdown) -> [str]:
+    "Return the lines describing given section in given format"
+    return list(section.lines(fmt))
+
+
+def render_in_parallel(sections:[DocSection], jobs:int, fmt:type=Markdown, cache:FragmentCache=None) -> [[str]]:
+    """Yield lines of given sections in given format, in the same order,
+    rendering those that are not in cache with a pool of `jobs` processes"""
+    cached = [cache.get(section) if cache else None for section in sections]
+    todo = [section for section, lines in zip(sections, cached) if lines is None]
+    initargs = (prefetched_state(), render_utils.REGEX_LINKS)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=initargs) as pool:
+        rendered = pool.map(functools.partial(section_lines, fmt=fmt), todo, chunksize=max(1, len(todo) // (jobs * 4)))
+        for section, lines in zip(sections, cached):
+            if lines is None:
+                lines = next(rendered)
+                if cache:  cache.put(section, lines)
+            yield lines
 
 
-def gen_lines(metamodel) -> [str]:
-    "Yield lines of markdown describing classes found in given metamodel"
-    classes = [metamodel.rootcls] + list(metamodel.user_classes.values())
-    print('CLASSES:', classes)
-    for cls in classes:
-        out = DocSection.from_textx_class(cls)
-        if out:
-            yield from out.as_markdown()
+def init_worker(prefetched:(dict, set), regex_links:str):
+    "Give to a rendering process the state of the main one"
+    install_state(*prefetched)
+    set_regex_links(regex_links)
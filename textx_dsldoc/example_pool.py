@@ -0,0 +1,186 @@
+"""Computation of the examples of all regexes of a grammar before its rendering,
+in a pool of worker processes, with a time budget for each regex.
+
+A pathological regex can keep re.fullmatch busy for a very long time.
+Computing its examples in a worker that is killed once the budget is spent
+keeps the documentation build going: the regex is then rendered
+without examples, and a warning is emitted.
+
+The budget of a regex is counted from the moment a worker starts on it,
+as reported by the worker. When all workers are stuck on regexes
+out of budget, the pool is replaced by a new one for the remaining regexes.
+
+The computed examples are kept until clear_prefetched() is called,
+which converters.gen_sections does once the sections are rendered.
+Long-running processes keep an ExamplePool between renderings.
+
+"""
+
+import time
+import queue
+import signal
+import warnings
+import multiprocessing
+from . import profiling, render_utils
+from .render_metamodel import DocRegexSection
+
+
+# time allowed to compute the examples of a regex, in seconds
+DEFAULT_TIMEOUT = 10.
+# delay between two checks of the progress of the workers, in seconds
+POLL_INTERVAL = 0.02
+STARTED = None  # in workers, the queue receiving the regexes they start on
+
+
+def example_requests(sections) -> {str: {int}}:
+    """Return the amounts of examples asked by the rendering of given sections, by regex"""
+    requests = {}
+    for section in sections:
+        for regex in section.regexes:
+            requests.setdefault(regex, set()).add(3)
+        if isinstance(section, DocRegexSection):  # all examples are only needed for pythex links
+            requests[section.regex] |= {0, 4} if render_utils.REGEX_LINKS != 'local' else {4}
+    return requests
+
+
+def examples_of(regex:str, amounts:[int]) -> {int: tuple}:
+    """Return the examples of given regex for each given amount"""
+    return {amount: render_utils.get_match_examples(regex, amount) for amount in amounts}
+
+
+def examples_in_worker(regex:str, amounts:[int]) -> {int: tuple}:
+    """Signal the start of the computation of given regex examples, then compute them"""
+    STARTED.put(regex)
+    return examples_of(regex, amounts)
+
+
+def init_example_worker(started:multiprocessing.Queue):
+    global STARTED
+    STARTED = started
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is handled by the main process, that kills the workers
+
+
+def prefetch_examples(sections, *, timeout:float=DEFAULT_TIMEOUT, workers:int=None) -> [str]:
+    """Compute the examples of all regexes of given sections in a pool of
+    `workers` processes (default: one per CPU), making them available
+    to render_utils.get_match_examples.
+
+    Return the regexes whose examples were not computed within `timeout` seconds
+    of computation. They will be rendered without examples.
+
+    """
+    todo = missing_examples(sections)
+    if not todo:
+        return []
+    pool = ExamplePool(min(workers or multiprocessing.cpu_count(), len(todo)))
+    try:
+        return pool.prefetch(sections, timeout=timeout)
+    finally:
+        pool.close()
+
+
+def missing_examples(sections) -> {str: [int]}:
+    """Return the amounts of examples asked by the rendering of given sections
+    that were not prefetched yet, by regex"""
+    return {regex: sorted(amounts) for regex, amounts in example_requests(sections).items()
+            if any((regex, amount) not in render_utils.PREFETCHED_EXAMPLES for amount in amounts)}
+
+
+class ExamplePool:
+    """Pool of processes computing the examples of regexes, that can be kept
+    between calls to prefetch, as done by the server module.
+
+    The processes are started at creation, with the default start method:
+    when it's fork, the pool must be created before starting threads.
+    Processes stuck on a regex are killed once all the regexes are handled,
+    and replaced when needed by processes started with given method
+    (default: the same), like spawn for multi-threaded programs.
+
+    """
+
+    def __init__(self, workers:int=None, *, replacement:str=None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.replacement = replacement
+        self._start(multiprocessing.get_context())
+
+    def _start(self, context):
+        self.started = context.Queue()
+        self.pool = context.Pool(self.workers, initializer=init_example_worker, initargs=(self.started,))
+
+    def prefetch(self, sections, *, timeout:float=DEFAULT_TIMEOUT) -> [str]:
+        """Same as prefetch_examples, with the processes of the pool"""
+        todo, timed_out = missing_examples(sections), []
+        with profiling.stage('examples'):
+            while todo:  # each round ends when all the workers are stuck
+                if self.pool is None:
+                    self._start(multiprocessing.get_context(self.replacement))
+                for _ in _received(self.started, 0):  pass  # regexes started in previous calls
+                stuck = _prefetch_round(todo, timeout, self.pool, self.started, self.workers)
+                if stuck:  # their workers are lost until the pool is terminated
+                    self.close()
+                timed_out += stuck
+        render_utils.TIMED_OUT_REGEXES.update(timed_out)
+        return timed_out
+
+    def close(self):
+        """Kill the processes, including those still stuck on a regex"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.started.close()
+            self.pool = None
+
+
+def _prefetch_round(todo:{str: [int]}, timeout:float, pool:multiprocessing.Pool,
+                    started:multiprocessing.Queue, processes:int) -> [str]:
+    """Compute examples of given regexes in given pool of given number of processes,
+    until they are all handled or all the processes are stuck.
+    Handled regexes are removed from todo. Return those that timed out"""
+    timed_out = []
+    pending = {regex: pool.apply_async(examples_in_worker, (regex, amounts)) for regex, amounts in todo.items()}
+    start_times = {}
+    while pending and len(timed_out) < processes:
+        for regex in _received(started, POLL_INTERVAL):
+            start_times[regex] = time.monotonic()
+        now = time.monotonic()
+        for regex in list(pending):
+            if pending[regex].ready():
+                examples = pending.pop(regex).get()
+            elif regex in start_times and now - start_times[regex] > timeout:
+                del pending[regex]  # its worker is lost until the pool is terminated
+                warnings.warn(f"examples of regex /{regex}/ not computed within {timeout}s, it will be rendered without")
+                timed_out.append(regex)
+                examples = dict.fromkeys(todo[regex], ())
+            else:
+                continue
+            for amount, found in examples.items():
+                render_utils.PREFETCHED_EXAMPLES[regex, amount] = found
+            del todo[regex]
+    return timed_out
+
+
+def _received(channel:multiprocessing.Queue, wait:float) -> [str]:
+    """Yield the items put in given queue, waiting at most given time for the first"""
+    try:
+        yield channel.get(timeout=wait)
+        while True:
+            yield channel.get_nowait()
+    except queue.Empty:
+        return
+
+
+def prefetched_state() -> (dict, set):
+    """Return what prefetch_examples computed, to be given to install_state
+    in processes that did not inherit it"""
+    return render_utils.PREFETCHED_EXAMPLES, render_utils.TIMED_OUT_REGEXES
+
+
+def install_state(examples:dict, timed_out:set):
+    render_utils.PREFETCHED_EXAMPLES.update(examples)
+    render_utils.TIMED_OUT_REGEXES.update(timed_out)
+
+
+def clear_prefetched():
+    """Forget the examples computed by prefetch_examples, and which regexes timed out"""
+    render_utils.PREFETCHED_EXAMPLES.clear()
+    render_utils.TIMED_OUT_REGEXES.clear()
@@ -0,0 +1,94 @@
+"""Output formats of the documentation.
+
+A format is a class giving the inline markup (links, code…) of the
+output, so that the same rendering routines can produce markdown or html.
+
+"""
+
+import os
+import re
+import html
+
+
+class Markdown:
+    name = 'markdown'
+    extension = '.md'
+    extensions = {'.md', '.mkd', '.markdown'}
+
+    @staticmethod
+    def text(text:str) -> str:
+        return text
+
+    @staticmethod
+    def code(text:str) -> str:
+        return f'`{text}`'
+
+    @staticmethod
+    def emphasis(text:str) -> str:
+        return f'*{text}*'
+
+    @staticmethod
+    def link(content:str, url:str) -> str:
+        return f'[{content}]({url})'
+
+
+class Html:
+    name = 'html'
+    extension = '.html'
+    extensions = {'.html', '.htm'}
+
+    @staticmethod
+    def text(text:str) -> str:
+        return html.escape(text, quote=False)
+
+    @staticmethod
+    def code(text:str) -> str:
+        return f'<code>{html.escape(text, quote=False)}</code>'
+
+    @staticmethod
+    def emphasis(text:str) -> str:
+        return f'<em>{text}</em>'
+
+    @staticmethod
+    def link(content:str, url:str) -> str:
+        return f'<a href="{html.escape(url)}">{content}</a>'
+
+
+FORMATS = {fmt.name: fmt for fmt in (Markdown, Html)}
+
+
+def format_of(path:str) -> type:
+    """Return the format of given output file, from its extension (markdown if unknown)"""
+    extension = os.path.splitext(path)[1].lower()
+    return next((fmt for fmt in FORMATS.values() if extension in fmt.extensions), Markdown)
+
+
+def html_list(items:[(int, str)]) -> [str]:
+    """Yield the html lines of the nested lists made of given (depth, content)"""
+    depth = -1
+    for item_depth, content in items:
+        if item_depth > depth:
+            yield '<ul>' * (item_depth - depth)
+        else:
+            yield '</li>' + '</ul></li>' * (depth - item_depth)
+        yield '<li>' + content
+        depth = item_depth
+    if depth >= 0:
+        yield '</li>' + '</ul></li>' * depth + '</ul>'
+
+
+def html_paragraphs(text:str) -> [str]:
+    """Yield the html paragraphs of given raw text, separated by empty lines"""
+    for paragraph in text.strip().split('\n\n'):
+        if paragraph.strip():
+            yield '<p>' + html.escape(paragraph.strip(), quote=False) + '</p>'
+
+
+# line breaks between tags, or before the end of a block
+MINIFIABLE_SPACES = re.compile(r'(?<=>)\s*\n\s*(?=<)|\s*\n\s*(?=</(?:li|ul|p|h1)>)')
+
+
+def minify_html(text:str) -> str:
+    """Return given html without the line breaks (and indentation) between tags,
+    that are not significant in the documentation html"""
+    return MINIFIABLE_SPACES.sub('', text).strip('\n')
@@ -0,0 +1,61 @@
+"""Graph of the references between the rules of a metamodel.
+
+Each class is visited once: its attributes, the rules inheriting from it,
+and its arpeggio tree up to the roots of the other rules, so building the
+graph, or finding the rules reachable from some entry rules, is linear
+in the size of the grammar.
+
+"""
+
+
+def referenced_classes(textx_class) -> [type]:
+    """Return the textx classes directly referenced by given one,
+    in order of appearance in the rule"""
+    refs = {}  # used as an ordered set
+    for attr in getattr(textx_class, '_tx_attrs', {}).values():
+        if hasattr(attr.cls, '__name__'):
+            refs[attr.cls] = None
+    refs.update(dict.fromkeys(getattr(textx_class, '_tx_inh_by', ())))
+    stack, seen = [getattr(textx_class, '_tx_peg_rule', None)], set()
+    while stack:
+        node = stack.pop()
+        if node is None or id(node) in seen:  continue
+        seen.add(id(node))
+        node_class = getattr(node, '_tx_class', None)
+        if node_class is not None and node_class is not textx_class:
+            refs[node_class] = None  # root of another rule, described by its own class
+            continue
+        stack.extend(reversed(getattr(node, 'nodes', ())))
+    refs.pop(textx_class, None)
+    return list(refs)
+
+
+def rule_references(textx_class) -> {str}:
+    """Return the names of the rules directly referenced by given textx class"""
+    return {cls.__name__ for cls in referenced_classes(textx_class)}
+
+
+def reachable_classes(entries:[type]) -> [type]:
+    """Return the textx classes reachable from given ones (included),
+    in breadth-first order"""
+    order = list(dict.fromkeys(entries))
+    seen = set(order)
+    for textx_class in order:  # grows while iterated
+        for target in referenced_classes(textx_class):
+            if target not in seen:
+                seen.add(target)
+                order.append(target)
+    return order
+
+
+def reference_graph(classes) -> ({str: frozenset}, {str: frozenset}):
+    """Return the forward graph {rule: referenced rules} of given textx classes,
+    and the reverse one {rule: rules referencing it}"""
+    forward, reverse = {}, {}
+    for textx_class in classes:
+        name = textx_class.__name__
+        if name in forward:  continue  # the root may appear twice
+        forward[name] = frozenset(rule_references(textx_class))
+        for target in forward[name]:
+            reverse.setdefault(target, set()).add(name)
+    return forward, {name: frozenset(sources) for name, sources in reverse.items()}
@@ -0,0 +1,122 @@
+"""Multi-page html output: one page per documented rule, and an index page.
+
+The links to #rule anchors of the single-page output are rewritten
+to the page of the rule. The rule is found from the text of the link,
+since rules differing only by case share the same lowercased anchor.
+A manifest of the written pages, holding the hash of their content,
+allows to only write again the pages that changed.
+
+"""
+
+import os
+import re
+import json
+import html
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from . import profiling
+from .formats import Html, html_list
+from .artifacts import OutputFiles
+from .converters import gen_sections
+from .regex_tester import document_end, write_asset
+from .search import SearchIndex
+
+
+INDEX_PAGE = 'index.html'
+MANIFEST = '.pages.json'
+SEARCH_SCRIPT = 'search.js'
+ANCHOR_LINK = re.compile(r'href="#([^"]*)">([^<]*)</a>')
+
+
+def page_of(name:str) -> str:
+    """Return the file name of the page documenting given rule,
+    if no other documented rule has the same name but for the case"""
+    page = name.lower() + '.html'
+    return page if page != INDEX_PAGE else 'index-rule.html'
+
+
+def page_names(names:[str]) -> {str: str}:
+    """Return the file name of the page of each given rule. Pages of rules whose names
+    differ only by case are told apart by a suffix depending only on the name,
+    so that they are distinct on case-insensitive file systems too"""
+    by_page = {}
+    for name in names:
+        by_page.setdefault(page_of(name), set()).add(name)
+    pages = {}
+    for page, same in by_page.items():
+        for name in same:
+            suffix = '-' + hashlib.sha1(name.encode()).hexdigest()[:8] if len(same) > 1 else ''
+            pages[name] = page[:-len('.html')] + suffix + '.html'
+    return pages
+
+
+def rewrite_links(line:str, pages:{str: str}) -> str:
+    """Return given html line with links to anchors of given rules
+    turned into links to their page"""
+    def repl(match):
+        name = html.unescape(match.group(2))
+        page = pages.get(name) if name.lower() == match.group(1) else None
+        return f'href="{html.escape(page)}">{match.group(2)}</a>' if page else match.group(0)
+    return ANCHOR_LINK.sub(repl, line)
+
+
+def page_lines(section, lines:[str], pages:{str: str}) -> [str]:
+    """Return the lines of the page of given section, made of its given html lines"""
+    lines = [rewrite_links(line, pages) for line in lines + document_end([section])]
+    return [f'<p>{Html.link("Index", INDEX_PAGE)}</p>'] + lines
+
+
+def index_lines(sections, pages:{str: str}) -> [str]:
+    """Yield the lines of the index page, linking to the pages of given sections"""
+    yield '<h1>Index</h1>'
+    yield from html_list((0, Html.link(html.escape(section.name), pages[section.name])) for section in sections)
+
+
+def write_pages(sections:list, directory:str, *, minify:bool=False, compress:bool=False,
+                search:bool=False, threads:int=8, **options) -> (int, int):
+    """Write in given directory the page of each of given sections, and an index.
+    Only pages whose content changed since the previous call are written.
+    If search is given, a search index is written too, and all pages get a search box.
+    Options are given to converters.gen_sections.
+
+    Return the number of written pages, and the total number of pages.
+
+    """
+    os.makedirs(directory, exist_ok=True)
+    unique = {}
+    for section in sections:  # the root may appear twice
+        unique.setdefault(section.name, section)
+    sections = list(unique.values())
+    pages = page_names(unique)
+    search_index = SearchIndex(SEARCH_SCRIPT, url_of=pages.get) if search else None
+    widget = search_index.widget_lines() if search else []
+    contents = {INDEX_PAGE: '\n'.join(list(index_lines(sections, pages)) + widget)}
+    for section, lines in zip(sections, gen_sections(sections, fmt=Html, search_index=search_index, **options)):
+        contents[pages[section.name]] = '\n'.join(page_lines(section, lines, pages) + widget)
+
+    manifest_path = os.path.join(directory, MANIFEST)
+    try:
+        with open(manifest_path) as fd:
+            previous = json.load(fd)
+    except (OSError, ValueError):
+        previous = {}
+    flags = f'{minify}{compress}'
+    hashes = {page: hashlib.sha1((flags + content).encode()).hexdigest() for page, content in contents.items()}
+    todo = [page for page in contents if previous.get(page) != hashes[page]
+            or not os.path.exists(os.path.join(directory, page))]
+
+    def write(page:str):
+        with OutputFiles(os.path.join(directory, page), minify=minify, compress=compress) as files:
+            files.write(contents[page])
+    with profiling.stage('write'), ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(write, todo))
+    for page in set(previous) - set(contents):  # pages of removed rules
+        for path in (page, page + '.gz', page + '.br'):
+            if os.path.exists(os.path.join(directory, path)):
+                os.remove(os.path.join(directory, path))
+    with open(manifest_path, 'w') as fd:
+        json.dump(hashes, fd, indent=0, sort_keys=True)
+    write_asset(os.path.join(directory, INDEX_PAGE))
+    if search:
+        search_index.write(os.path.join(directory, SEARCH_SCRIPT))
+    return len(todo), len(contents)
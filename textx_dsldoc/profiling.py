@@ -0,0 +1,119 @@
+"""Measure of the time and memory spent in each stage of the documentation.
+
+Instrumented code wraps its stages in profiling.stage(name), and the
+rendering of each rule in profiling.rule(name). That costs nothing
+until a Profiler is enabled.
+
+"""
+
+import time
+import contextlib
+
+
+# the enabled profiler, if any
+PROFILER = None
+
+
+class NoProfiling:
+    "Context manager doing nothing, used when no profiler is enabled"
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_PROFILING = NoProfiling()  # stateless, so shared by all stages
+
+
+class Profiler:
+    """Collect wall time, number of calls and tracemalloc peak of stages,
+    and wall time of rules. Time of nested stages is also counted
+    in the enclosing ones.
+
+    """
+
+    def __init__(self, *, trace_memory:bool=True):
+        self.trace_memory = bool(trace_memory)
+        self.stages = {}  # name -> {'time': s, 'calls': int, 'peak': bytes}
+        self.rules = {}  # name -> s
+        self._stack = []  # [name, start time, peak of already finished substages]
+
+    def enable(self):
+        global PROFILER
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+        PROFILER = self
+        return self
+
+    def disable(self):
+        global PROFILER
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.stop()
+        PROFILER = None
+
+    def _traced_peak(self) -> int:
+        if not self.trace_memory:  return 0
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1]
+
+    def _reset_peak(self):
+        if self.trace_memory:
+            import tracemalloc
+            if hasattr(tracemalloc, 'reset_peak'):  # python 3.9+
+                tracemalloc.reset_peak()
+
+    @contextlib.contextmanager
+    def stage(self, name:str):
+        if self._stack:  # the peak of the enclosing stage is about to be reset
+            self._stack[-1][2] = max(self._stack[-1][2], self._traced_peak())
+        self._reset_peak()
+        stats = self.stages.setdefault(name, {'time': 0., 'calls': 0, 'peak': 0})
+        entry = [name, time.perf_counter(), 0]
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            peak = max(entry[2], self._traced_peak())
+            stats['time'] += time.perf_counter() - entry[1]
+            stats['calls'] += 1
+            stats['peak'] = max(stats['peak'], peak)
+            if self._stack:
+                self._stack[-1][2] = max(self._stack[-1][2], peak)
+
+    @contextlib.contextmanager
+    def rule(self, name:str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.rules[name] = self.rules.get(name, 0.) + time.perf_counter() - start
+
+    def as_dict(self, slowest:int=10) -> dict:
+        rules = sorted(self.rules.items(), key=lambda item: -item[1])[:slowest]
+        return {'stages': self.stages, 'slowest rules': [{'name': name, 'time': duration} for name, duration in rules]}
+
+    def report(self, slowest:int=10) -> [str]:
+        """Yield lines of the human-readable report"""
+        yield f"{'stage':<20}{'time (ms)':>12}{'calls':>10}{'peak (MB)':>12}"
+        for name, stats in self.stages.items():
+            yield f"{name:<20}{stats['time']*1000:>12.1f}{stats['calls']:>10}{stats['peak']/2**20:>12.2f}"
+        rules = self.as_dict(slowest)['slowest rules']
+        if rules:
+            yield ''
+            yield f'{len(rules)} slowest rules to render:'
+            for rule in rules:
+                yield f"{rule['name']:<30}{rule['time']*1000:>10.1f} ms"
+
+
+def stage(name:str):
+    """Context manager measuring given stage, if profiling is enabled"""
+    return PROFILER.stage(name) if PROFILER else NO_PROFILING
+
+
+def rule(name:str):
+    """Context manager measuring the rendering of given rule, if profiling is enabled"""
+    return PROFILER.rule(name) if PROFILER else NO_PROFILING
@@ -0,0 +1,166 @@
+"""Synthesis of strings matching a regex, by walking its parsed tree.
+
+Unlike a random generator, the enumeration is bounded: each node of the
+tree yields at most MAX_CANDIDATES strings of at most MAX_LENGTH characters,
+and repetitions are only tried a few times more than their minimum,
+so the synthesis always terminates quickly. Alternatives are interleaved,
+so that each branch of an alternation gets represented.
+
+"""
+
+import functools
+
+try:  # python 3.11+
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from .render_utils import compiled_regex
+
+
+MAX_CANDIDATES = 32  # strings kept for each node of the regex tree
+MAX_LENGTH = 24  # maximal length of a synthesized string
+MAX_EXTRA_REPEAT = 2  # number of repetitions tried above the minimum
+
+# characters used to represent the character classes
+CATEGORY_SAMPLES = {
+    'CATEGORY_DIGIT': '07',
+    'CATEGORY_NOT_DIGIT': 'a-',
+    'CATEGORY_SPACE': ' ',
+    'CATEGORY_NOT_SPACE': 'a0',
+    'CATEGORY_WORD': 'aZ0_',
+    'CATEGORY_NOT_WORD': '- .',
+    'CATEGORY_LINEBREAK': '\n',
+    'CATEGORY_NOT_LINEBREAK': 'a ',
+}
+CATEGORY_PREDICATES = {
+    'CATEGORY_DIGIT': str.isdigit,
+    'CATEGORY_NOT_DIGIT': lambda char: not char.isdigit(),
+    'CATEGORY_SPACE': str.isspace,
+    'CATEGORY_NOT_SPACE': lambda char: not char.isspace(),
+    'CATEGORY_WORD': lambda char: char.isalnum() or char == '_',
+    'CATEGORY_NOT_WORD': lambda char: not (char.isalnum() or char == '_'),
+    'CATEGORY_LINEBREAK': lambda char: char == '\n',
+    'CATEGORY_NOT_LINEBREAK': lambda char: char != '\n',
+}
+ANY_SAMPLES = 'aZ0-'
+NEGATED_POOL = 'aZ0_ -.!/"\'x9'
+
+
+@functools.lru_cache(maxsize=1024)
+def synthesized_examples(regex:str) -> (str,):
+    """Return strings fully matched by given regex, in an order that
+    alternates between the branches of the regex"""
+    try:
+        tree = sre_parse.parse(regex)
+    except Exception:  # not a regex python understands
+        return ()
+    fullmatch = compiled_regex(regex).fullmatch
+    return tuple(example for example in expand_sequence(tree) if fullmatch(example))
+
+
+def expand_sequence(items) -> [str]:
+    """Return strings matching given sequence of regex tree nodes"""
+    candidates = ['']
+    for op, arg in items:
+        candidates = combine(candidates, expand(op, arg))
+        if not candidates:  break
+    return candidates
+
+
+def expand(op, arg) -> [str]:
+    """Return strings matching given regex tree node"""
+    name = str(op)
+    if name in {'LITERAL', 'LITERAL_IGNORE', 'LITERAL_UNI_IGNORE', 'LITERAL_LOC_IGNORE'}:
+        return [chr(arg)]
+    elif name.startswith('NOT_LITERAL'):
+        return [char for char in NEGATED_POOL if ord(char) != arg][:2]
+    elif name == 'ANY':
+        return list(ANY_SAMPLES)
+    elif name == 'IN':
+        return class_samples(arg)
+    elif name == 'BRANCH':
+        return interleave(expand_sequence(branch) for branch in arg[1])
+    elif name in {'SUBPATTERN', 'ATOMIC_GROUP'}:
+        return expand_sequence(arg[-1])
+    elif name in {'MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'}:
+        return expand_repeat(*arg)
+    elif name == 'GROUPREF_EXISTS':
+        _, yes, no = arg
+        return interleave((expand_sequence(yes), expand_sequence(no) if no else ['']))
+    # anchors, lookarounds and back references are zero-width here:
+    #  the resulting strings are checked against the regex anyway.
+    return ['']
+
+
+def expand_repeat(min_count:int, max_count:int, items) -> [str]:
+    if min_count > MAX_LENGTH:
+        return []
+    max_count = min(max_count, min_count + MAX_EXTRA_REPEAT)
+    sub = expand_sequence(items)
+    repeated, results = [''], []
+    for count in range(max_count + 1):
+        if count >= min_count:
+            results.append(repeated)
+        repeated = combine(repeated, sub)
+        if not repeated:  break
+    return interleave(results)
+
+
+def class_samples(items) -> [str]:
+    """Return characters matched by given character class"""
+    negated = items and str(items[0][0]) == 'NEGATE'
+    if negated:
+        return [char for char in NEGATED_POOL if not class_contains(items[1:], char)][:3]
+    samples = []
+    for op, arg in items:
+        name = str(op)
+        if name.startswith('LITERAL'):
+            samples.append(chr(arg))
+        elif name.startswith('RANGE'):
+            low, high = arg
+            samples.extend(map(chr, (low, high, (low + high) // 2)))
+        elif name == 'CATEGORY':
+            samples.extend(CATEGORY_SAMPLES.get(str(arg), ''))
+    return unique(samples)
+
+
+def class_contains(items, char:str) -> bool:
+    """True if given char belongs to given (non negated) character class"""
+    for op, arg in items:
+        name = str(op)
+        if name.startswith('LITERAL') and ord(char) == arg:
+            return True
+        elif name.startswith('RANGE') and arg[0] <= ord(char) <= arg[1]:
+            return True
+        elif name == 'CATEGORY' and CATEGORY_PREDICATES.get(str(arg), bool)(char):
+            return True
+    return False
+
+
+def combine(prefixes:[str], suffixes:[str]) -> [str]:
+    """Return concatenations of given prefixes and suffixes, enumerated
+    diagonally so that all of them appear early"""
+    results = []
+    for total in range(len(prefixes) + len(suffixes) - 1):
+        for idx in range(max(0, total - len(suffixes) + 1), min(total, len(prefixes) - 1) + 1):
+            results.append(prefixes[idx] + suffixes[total - idx])
+        if len(results) >= MAX_CANDIDATES * 2:  break
+    return unique(results)
+
+
+def interleave(alternatives:iter) -> [str]:
+    """Return strings of given lists, taking the first of each list, then the second…"""
+    alternatives = list(alternatives)
+    longest = max(map(len, alternatives), default=0)
+    return unique(alt[idx] for idx in range(longest) for alt in alternatives if idx < len(alt))
+
+
+def unique(strings:iter) -> [str]:
+    """Return given strings without duplicates or too long ones, keeping the order"""
+    seen = {}
+    for string in strings:
+        if len(string) <= MAX_LENGTH:
+            seen.setdefault(string, None)
+            if len(seen) >= MAX_CANDIDATES:  break
+    return list(seen)
@@ -0,0 +1,103 @@
+"""Local regex tester, replacing the links to pythex.org.
+
+In local mode (see set_regex_links), each regex links to a compact id
+instead of a pythex.org url holding the regex and its examples.
+The regexes and their examples are written once, as a JSON table at the end
+of the document, and a small script shared by all documents of a directory
+opens a tester when a regex is clicked. Works offline.
+
+"""
+
+import os
+import json
+from . import render_utils, rule_ir
+from .render_utils import get_match_examples, regex_id
+
+
+REGEX_LINKS_MODES = ('pythex', 'local')
+ASSET_NAME = 'regex-tester.js'
+ASSET = r"""// regex tester of textx-dsldoc documentation, fed by the #regex-table JSON
+(function () {
+  var table = null, panel = null;
+  function loadTable() {
+    if (table === null) table = JSON.parse(document.getElementById('regex-table').textContent);
+    return table;
+  }
+  function update() {
+    var out = panel.querySelector('ul'), regex;
+    out.innerHTML = '';
+    try {
+      regex = new RegExp('^(?:' + panel.dataset.regex + ')$');
+    } catch (err) {
+      out.textContent = 'Not testable in the browser: ' + err.message;
+      return;
+    }
+    panel.querySelector('textarea').value.split('\n').forEach(function (line) {
+      var item = document.createElement('li');
+      item.textContent = (regex.test(line) ? '✔ ' : '✘ ') + line;
+      out.appendChild(item);
+    });
+  }
+  function open(id) {
+    var entry = loadTable()[id];
+    if (!entry) return;
+    if (panel === null) {
+      panel = document.createElement('div');
+      panel.style.cssText = 'position:fixed;right:1em;bottom:1em;width:30em;padding:1em;background:#fff;border:1px solid #888;';
+      panel.innerHTML = '<button style="float:right">×</button><code></code><textarea rows="5" style="width:100%"></textarea><ul></ul>';
+      panel.querySelector('button').onclick = function () { panel.style.display = 'none'; };
+      panel.querySelector('textarea').oninput = update;
+      document.body.appendChild(panel);
+    }
+    panel.dataset.regex = entry.regex;
+    panel.querySelector('code').textContent = '/' + entry.regex + '/';
+    panel.querySelector('textarea').value = entry.examples.join('\n');
+    panel.style.display = 'block';
+    update();
+  }
+  document.addEventListener('click', function (event) {
+    var link = event.target.closest('a[href^="#regex-"]');
+    if (link) {
+      event.preventDefault();
+      open(link.getAttribute('href').slice(7));
+    }
+  });
+})();
+"""
+
+
+def set_regex_links(mode:str):
+    """Make regexes of html output link to pythex.org, or to the local tester"""
+    if mode not in REGEX_LINKS_MODES:
+        raise ValueError(f"Unknown regex links mode '{mode}', expected one of {REGEX_LINKS_MODES}")
+    if mode != render_utils.REGEX_LINKS:
+        render_utils.REGEX_LINKS = mode
+        rule_ir.clear_caches()  # renderings of the previous mode
+
+
+def regex_table(sections) -> {str: dict}:
+    """Return the regexes of given sections, with their examples, by id"""
+    return {regex_id(regex): {'regex': regex, 'examples': list(get_match_examples(regex))}
+            for section in sections for regex in sorted(section.regexes)}
+
+
+def document_end(sections) -> [str]:
+    """Return the lines to add after the sections of the document, in order
+    to make the local tester work. They are html, which markdown accepts too."""
+    if render_utils.REGEX_LINKS != 'local':
+        return []
+    table = json.dumps(regex_table(sections), sort_keys=True).replace('</', '<\\/')
+    return [f'<script type="application/json" id="regex-table">{table}</script>',
+            f'<script src="{ASSET_NAME}" defer></script>']
+
+
+def write_asset(output:str):
+    """Write the tester script in the directory of given output file, if needed"""
+    if render_utils.REGEX_LINKS != 'local':
+        return
+    path = os.path.join(os.path.dirname(output) or '.', ASSET_NAME)
+    if os.path.exists(path):
+        with open(path) as fd:
+            if fd.read() == ASSET:  return  # already written for another document
+    with open(path, 'w') as fd:
+        fd.write(ASSET)
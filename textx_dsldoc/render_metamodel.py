@@ -2,67 +2,105 @@
 
 """
 
+import sys
+import html
 import textx
+import hashlib
 import arpeggio
-import markdown
-from .render_utils import print_obj, get_match_examples, doc_from_class, render_regex, as_regex, SPECIAL_REGEXES, str_sequence_doc, render_arpeggio_sequence, CHARS_AS_READABLE
-from .render_arpeggio import render_arpeggio_sequence_as_str
+from . import __version__, render_utils
+from .formats import Markdown, Html, html_list, html_paragraphs
+from .render_utils import print_obj, get_match_examples, doc_from_class, render_regex, as_regex, SPECIAL_REGEXES, CHARS_AS_READABLE, TIMED_OUT_REGEXES
+from .rule_ir import ir_from_peg_rule, reinterned, ir_as_str, sequence_items, cached_regex_rendering, referenced_rules, referenced_regexes, referenced_strings
+
+
+# said of the regexes whose examples could not be computed in time
+TIMED_OUT_WARNING = 'its examples could not be computed in time'
 
 
 class ParsingSequence:
+    __slots__ = ('ir',)
 
     def __init__(self, peg_rule):
-        self.sequence = render_arpeggio_sequence(peg_rule)
-        self.sequence_repr = tuple(render_arpeggio_sequence_as_str(peg_rule))
+        self.ir = ir_from_peg_rule(peg_rule)
+
+    def __setstate__(self, state:tuple):
+        self.ir = reinterned(state[1]['ir'])
+
+    def sequence_repr(self, fmt:type=Markdown) -> (str,):
+        """Return the one-line representation of each item of the sequence"""
+        # computed only when rendering, since it needs the regex examples
+        return tuple(ir_as_str(node, fmt) for node in sequence_items(self.ir))
+
+    def description(self, fmt:type=Markdown) -> [(int, str)]:
+        """Yield (depth, line) describing each item of the sequence"""
+        for item in sequence_items(self.ir):
+            type_line, *sublines = ParsingSequence.item_repr(item, fmt)
+            if type_line:
+                # print('LINER:', type_line, f'\t({len(sublines)} sublines)')
+                yield 0, 'Type ' + type_line
+            for line in sublines:
+                depth = 1
+                while line.startswith('    - '):
+                    depth, line = depth + 1, line[len('    - '):]
+                yield depth, line
 
     def as_markdown(self):
         """Yield mkd lines describing self sequence tuple representing the grammar"""
         yield ''
-        yield '<p style="margin-left: 40px"><tt>' + markdown.markdown(' '.join(self.sequence_repr)) + '</tt></p>'
+        yield '<p style="margin-left: 40px"><tt>' + ' '.join(self.sequence_repr(Html)) + '</tt></p>'
         yield ''
-        to_add = []
-        for item in self.sequence:
-            type_line, *sublines = ParsingSequence.item_repr(item)
-            if type_line:
-                # print('LINER:', type_line, f'\t({len(sublines)} sublines)')
-                yield '- Type ' + type_line
-            for line in sublines:
-                head = '    ' if line.startswith(' ') else '    - '
-                yield head + line
+        for depth, line in self.description(Markdown):
+            yield '    ' * depth + '- ' + line
+
+    def as_html(self):
+        """Yield html lines describing self sequence tuple representing the grammar"""
+        yield '<p style="margin-left: 40px"><tt>' + ' '.join(self.sequence_repr(Html)) + '</tt></p>'
+        yield from html_list(self.description(Html))
 
     @staticmethod
-    def item_repr(item) -> [str]:
-        while len(item) == 1: item, = item
-        if not item:
-            pass  # nothing to do
-        elif item[0] == 'regex':
-            yield f'anything matching regex {render_regex(item[1])}'
-        elif item[0] == 'special regex':
+    @cached_regex_rendering
+    def item_repr(item:tuple, fmt:type=Markdown) -> (str,):
+        """Return lines describing given IR node in given format, the first one
+        being the continuation of a sentence"""
+        return tuple(ParsingSequence._item_lines(item, fmt))
+
+    @staticmethod
+    def _item_lines(item:tuple, fmt:type) -> [str]:
+        kind = item[0]
+        if kind == 'regex':
+            line = f'anything matching regex {render_regex(item[1], fmt=fmt)}'
+            if item[1] in TIMED_OUT_REGEXES:
+                line += f' ({fmt.emphasis("Warning:")} {TIMED_OUT_WARNING})'
+            yield line
+        elif kind == 'special regex':
             yield f'anything matching standard regex {item[1].upper()}'
-        elif len(item) == 3 and item[0] in {'0..*', '1..*'}:
-            _, objname, sep = item
-            sep = CHARS_AS_READABLE.get(sep, "\'" + str(sep) + "\'")
-            if item[0] == '0..*':
-                yield f'zero or any number of [{objname}](#{objname.lower()}) separated by {sep}'
+        elif kind == 'rule':
+            yield 'a ' + fmt.link(item[1], '#' + item[1].lower())
+        elif kind in {'0..*', '1..*'}:
+            _, _, target, sep = item
+            sep = fmt.text(CHARS_AS_READABLE.get(sep, "\'" + str(sep) + "\'"))
+            first, *lasts = ParsingSequence.item_repr(target, fmt)
+            if target[0] == 'rule':  # the article is already given
+                first = first[2:]
+            if kind == '0..*':
+                yield f'zero or any number of {first} separated by {sep}'
             else:
-                yield f'at least one [{objname}](#{objname.lower()}) separated by {sep}'
-        elif len(item) == 2 and item[0] == '0..1':
-            _, sub = item
-            while len(sub) == 1: sub, = sub
-            first, *lasts = ParsingSequence.item_repr(sub)
+                yield f'at least one {first} separated by {sep}'
+            yield from lasts
+        elif kind == '0..1':
+            first, *lasts = ParsingSequence.item_repr(item[2], fmt)
             yield f'optionally ' + first
             yield from lasts
-        elif len(item) == 2 and item[0] is str:
-            yield f'the string `{item[1]}`'
-        elif item[0] == 'choice':
+        elif kind == 'str':
+            yield 'the string ' + fmt.code(item[1])
+        elif kind == 'choice':
             # In order to avoid a sublist, the following machinery avoid having
             #  a sublist when there is few elements, all described by a single line.
-            assert len(item) == 2
             lines = []
             inline = len(item[1]) < 4  # if True, push the content in a single line
             # NOTE: be based on the final length instead of the number of item would be more robust.
             for sub in item[1]:
-                first, *nexts = ParsingSequence.item_repr(sub)
+                first, *nexts = ParsingSequence.item_repr(sub, fmt)
                 lines.append(first)
                 for next_ in nexts:
                     lines.append('    - ' + next_)
@@ -72,13 +110,13 @@ class ParsingSequence:
             else:  # multiple lines
                 yield 'one of the following:'
                 yield from lines
-        elif isinstance(item, tuple):  # this is a composed object
+        elif kind == 'sequence':  # this is a composed object
             yield 'in this order:'
-            for sub in item:
-                yield from ParsingSequence.item_repr(sub)
+            for sub in item[1]:
+                yield from ParsingSequence.item_repr(sub, fmt)
         else:  # Unexpected object
             print('WOOT:', item)
-            yield item
+            yield fmt.text(str(item))
 
 
 class DocSection:
@@ -87,14 +125,28 @@ class DocSection:
     TODO:
     - tooltips on class names and abstract rules: https://www.w3schools.com/howto/howto_css_tooltip.asp
 
+    Sections are slotted, and their names interned, since very large
+    grammars have tens of thousands of them.
+
     """
+    __slots__ = ('name', 'names_in_parents', 'raw_doc', 'sequence')
 
-    def __init__(self, name:str, names_in_parents:set=set(), raw_doc:str='', sequence:tuple=()):
-        self.name = str(name)
+    def __init__(self, name:str, names_in_parents:set=frozenset(), raw_doc:str='', sequence:tuple=()):
+        self.name = sys.intern(str(name))
         self.names_in_parents = frozenset(names_in_parents)
         self.raw_doc = str(raw_doc or '')
         self.sequence = ParsingSequence(sequence) if sequence else None
 
+    def __setstate__(self, state:tuple):
+        """Restore a pickled section (see cache.SectionsCache), sharing
+        its names with the other sections"""
+        for name, value in state[1].items():
+            if type(value) is str and name != 'raw_doc':
+                value = sys.intern(value)
+            elif type(value) in {tuple, frozenset}:  # names of choices or of parents
+                value = type(value)(sys.intern(item) for item in value)
+            setattr(self, name, value)
+
     def as_markdown(self):
         yield '# ' + self.name
         if self.raw_doc:
@@ -103,8 +155,63 @@ class DocSection:
             yield ''
             yield from self.sequence.as_markdown()
 
+    @property
+    def fingerprint(self) -> str:
+        """Stable hash of everything the rendering of the section depends on:
+        the rule structure (including referenced rule names), its docstring,
+        the rules using it and the target of regex links"""
+        data = (__version__, render_utils.REGEX_LINKS, type(self).__name__, self.name, self.raw_doc,
+                tuple(sorted(self.names_in_parents))) + self._fingerprint_data()
+        return hashlib.sha1(repr(data).encode()).hexdigest()
+
+    def _fingerprint_data(self) -> tuple:
+        return (self.sequence.ir if self.sequence else None,)
+
+    @property
+    def references(self) -> frozenset:
+        "Names of the rules referenced by the section"
+        return referenced_rules(self.sequence.ir) if self.sequence else frozenset()
+
+    @property
+    def regexes(self) -> frozenset:
+        "Regexes that need examples to render the section"
+        return referenced_regexes(self.sequence.ir) if self.sequence else frozenset()
+
+    @property
+    def strings(self) -> frozenset:
+        "Literal strings expected by the rule"
+        return referenced_strings(self.sequence.ir) if self.sequence else frozenset()
+
     def as_html(self) -> str:
-        return markdown.markdown('\n'.join(self.as_markdown()))
+        return '\n'.join(self.html_lines())
+
+    def html_lines(self):
+        yield f'<h1 id="{html.escape(self.name.lower())}">{html.escape(self.name)}</h1>'
+        if self.raw_doc:
+            yield from html_paragraphs(self.raw_doc)
+        if self.sequence:
+            yield from self.sequence.as_html()
+
+    def lines(self, fmt:type=Markdown) -> [str]:
+        """Yield the lines describing the section in given format"""
+        yield from self.html_lines() if fmt is Html else self.as_markdown()
+        yield from self.used_by_lines(fmt)
+
+    def used_by_lines(self, fmt:type=Markdown) -> [str]:
+        """Yield the lines linking to the rules using this one"""
+        if not self.names_in_parents:  return
+        links = ', '.join(fmt.link(name, '#' + name.lower()) for name in sorted(self.names_in_parents))
+        if fmt is Html:
+            yield f'<p>Used by {links}.</p>'
+        else:
+            yield ''
+            yield f'Used by {links}.'
+
+    @staticmethod
+    def documents(textx_class) -> bool:
+        """True if from_textx_class returns a DocSection for given textx class"""
+        if not hasattr(textx_class, '_tx_attrs'):  return False
+        return bool(as_regex(textx_class)) or textx_class.__name__ not in SPECIAL_REGEXES
 
     @staticmethod
     def from_textx_class(textx_class) -> (str, object):
@@ -127,54 +234,108 @@ class DocSection:
             kwargs['selection'], kwargs['target'] = textx_class.mult, textx_class.cls
         elif not textx_class._tx_attrs and textx_class._tx_inh_by:  # it's a raw choice
             cls = DocChoiceSection
-            kwargs['choice'] = tuple(textx_class._tx_inh_by)
+            kwargs['choices'] = tuple(subclass.__name__ for subclass in textx_class._tx_inh_by)
         else:  # it's a "regular" rule
             kwargs['sequence'] = textx_class._tx_peg_rule
         return cls(**kwargs)
 
 
 class DocChoiceSection(DocSection):
+    __slots__ = ('choices',)
+
     def __init__(self, choices:tuple, **kwargs):
-        self.choices = tuple(choices)
+        self.choices = tuple(sys.intern(str(choice)) for choice in choices)
         super().__init__(**kwargs)
 
     def as_markdown(self):
         yield from super().as_markdown()
         yield ''
         for choice in self.choices:
-            yield '- ' + str(choice)
+            yield f'- [{choice}](#{choice.lower()})'
+
+    def html_lines(self):
+        yield from super().html_lines()
+        yield from html_list((0, Html.link(choice, '#' + choice.lower())) for choice in self.choices)
+
+    def _fingerprint_data(self) -> tuple:
+        return super()._fingerprint_data() + self.choices
+
+    @property
+    def references(self) -> frozenset:
+        return super().references | frozenset(self.choices)
 
 class DocSelectionSection(DocSection):
+    __slots__ = ('selection', 'target')
+
     def __init__(self, selection:str, target:object, **kwargs):
-        self.target = str(target)
-        self.selection = str(selection)
+        self.target = sys.intern(str(target))
+        self.selection = sys.intern(str(selection))
         super().__init__(**kwargs)
 
     def as_markdown(self):
         yield from super().as_markdown()
         yield ''
-        print('SELECTION:', self.target)
+        yield self.description()
+
+    def html_lines(self):
+        yield from super().html_lines()
+        yield '<p>' + html.escape(self.description(), quote=False) + '</p>'
+
+    def description(self) -> str:
         if self.selection == '0..1':
-            yield 'Optionally, type a ' + str(self.target)
+            return 'Optionally, type a ' + str(self.target)
         elif self.selection == '1..*':
-            yield 'Type at least one ' + str(self.target)
+            return 'Type at least one ' + str(self.target)
         elif self.selection == '0..*':
-            yield 'Type zero or any number of ' + str(self.target)
+            return 'Type zero or any number of ' + str(self.target)
+        return ''
+
+    def _fingerprint_data(self) -> tuple:
+        return super()._fingerprint_data() + (self.selection, self.target)
+
+    @property
+    def references(self) -> frozenset:
+        return super().references | {self.target}
 
 class DocRegexSection(DocSection):
+    __slots__ = ('regex',)
+
     def __init__(self, regex:str, **kwargs):
-        self.regex = str(regex)
+        self.regex = sys.intern(str(regex))
         super().__init__(**kwargs)
 
     def as_markdown(self):
         yield from super().as_markdown()
+        yield from self._regex_lines(Markdown)
+        yield ''
+
+    def html_lines(self):
+        yield from super().html_lines()
+        first, *examples = self._regex_lines(Html)
+        yield '<p>' + first + '</p>'
+        yield from html_list((0, example[2:]) for example in examples if example)
+
+    def _regex_lines(self, fmt:type) -> [str]:
         examples = get_match_examples(self.regex, amount=4)
-        render = render_regex(self.regex, get_match_examples(self.regex, amount=0))
-        yield f'{self.name.title()} is a *regex rule*, detecting anything matched by {render}, such as:'
+        if render_utils.REGEX_LINKS == 'local':  # the tester doesn't need all the examples
+            render = render_regex(self.regex, fmt=fmt)
+        else:
+            render = render_regex(self.regex, get_match_examples(self.regex, amount=0), fmt=fmt)
+        if self.regex in TIMED_OUT_REGEXES:
+            yield (f'{self.name.title()} is a {fmt.emphasis("regex rule")}, detecting anything matched by {render}. '
+                   f'{fmt.emphasis("Warning:")} {TIMED_OUT_WARNING}.')
+            return
+        yield f'{self.name.title()} is a {fmt.emphasis("regex rule")}, detecting anything matched by {render}, such as:'
         yield ''
         for example in examples:
-            yield f'- <pre>{example}</pre>'
-        yield ''
+            yield f'- <pre>{fmt.text(example)}</pre>'
+
+    def _fingerprint_data(self) -> tuple:
+        return super()._fingerprint_data() + (self.regex,)
+
+    @property
+    def regexes(self) -> frozenset:
+        return super().regexes | {self.regex}
 
 
 if __name__ == '__main__':
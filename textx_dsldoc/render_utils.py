@@ -3,18 +3,22 @@
 """
 
 import re
-import exrex
 import random
+import hashlib
+import functools
 import itertools
 from pprint import pprint
 from itertools import chain
 
 import textx
 import arpeggio
+from . import profiling
+from .formats import Markdown
 
 
 
-REGEX_MATCH_EXAMPLES = {
+# base of the corpus of examples, completed by regex_match_examples()
+BASE_MATCH_EXAMPLES = {
     'CamelCaseWith5Words',
     'UPPER_CASE_WITH_5_WORDS',
     'snake_case_with_5_words',
@@ -47,8 +51,22 @@ REGEX_MATCH_EXAMPLES = {
     '../../a/relative/path/to/a/.dotfile',
     '../../a/relative/path/to/a/file',
 }
-REGEX_MATCH_EXAMPLES |= set(m.lower() for m in REGEX_MATCH_EXAMPLES)
-REGEX_MATCH_EXAMPLES |= set(m.title() for m in REGEX_MATCH_EXAMPLES)
+
+
+@functools.lru_cache(maxsize=1)
+def regex_match_examples() -> frozenset:
+    """Return the corpus of strings in which regexes examples are searched,
+    built at first call rather than at import time"""
+    examples = set(BASE_MATCH_EXAMPLES)
+    examples |= set(m.lower() for m in examples)
+    examples |= set(m.title() for m in examples)
+    return frozenset(examples)
+
+
+def __getattr__(name:str):
+    if name == 'REGEX_MATCH_EXAMPLES':  # the corpus is built lazily
+        return regex_match_examples()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def print_obj(obj, *, level:int=1) -> print:
@@ -59,38 +77,108 @@ def print_obj(obj, *, level:int=1) -> print:
             print('.\t', name.ljust(15), str(('"' + elem + '"') if isinstance(elem, str) else elem).ljust(60), type(elem))
 
 
-def get_match_examples(regex:str, amount:int=3) -> (str, str, str):
-    """Return a tuple of 3 strings matched by given regex"""
-    def get_matches():
-        for example in REGEX_MATCH_EXAMPLES:
-            if re.fullmatch(regex, example):
-                yield example
-    def similarity(one:str, two:str) -> int:
-        size = min(len(one), len(two))
-        return sum(int(a == b) for a, b in zip(one, two)) / size
-
-    matches = set(get_matches())
-
-    for similarity_threshold in (0.6, 0.5, 0.4, 0.3, 0.2, 0.1):
-        while amount and len(matches) > amount:
-            # detect those that are quite similar, keep in memory those we don't want
-            for one in set(matches):
-                for two in set(matches) - {one}:
-                    if similarity(one, two) >= 0.4:
-                        removing = two if len(one) > len(two) else one
-                        # print(f'REMOVING {removing} from {matches} because similarity({one}, {two}) == {similarity(one, two)}')
-                        matches -= {removing}
-                        break
-            else:  # no similarity found
-                break
-    while amount and len(matches) > amount:
-        matches -= {random.choice(tuple(matches))}
-
-    while amount and len(matches) < amount:  # Well, that's restrictive… Let's use a rexex generator !
-        # other lib to explore maybe: rstr: https://bitbucket.org/leapfrogdevelopment/rstr/
-        matches.add(exrex.getone(regex))
-
-    return tuple(sorted(tuple(matches)))  # keep it deterministic if no fallback on rexex
+# bounds of the per-process caches used to avoid scanning the examples corpus
+#  again for each occurrence of a regex (the standard terminals are used everywhere).
+REGEX_CACHE_SIZE = 1024
+EXAMPLES_CACHE_SIZE = 4096
+
+# examples computed ahead of rendering by example_pool.prefetch_examples,
+#  by (regex, amount), and the regexes whose examples were not computed in time.
+PREFETCHED_EXAMPLES = {}
+TIMED_OUT_REGEXES = set()
+
+# target of the links on regexes: 'pythex' for pythex.org,
+#  'local' for the tester of regex_tester module. Set with regex_tester.set_regex_links.
+REGEX_LINKS = 'pythex'
+
+
+@functools.lru_cache(maxsize=REGEX_CACHE_SIZE)
+def compiled_regex(regex:str):
+    """Return the compiled version of given regex"""
+    return re.compile(regex)
+
+
+@functools.lru_cache(maxsize=REGEX_CACHE_SIZE)
+def corpus_matches(regex:str) -> frozenset:
+    """Return the strings of the examples corpus fully matched by given regex"""
+    with profiling.stage('corpus matching'):
+        fullmatch = compiled_regex(regex).fullmatch
+        return frozenset(example for example in regex_match_examples() if fullmatch(example))
+
+
+def similarity(one:str, two:str) -> float:
+    """Return the ratio of identical characters at the same position in given strings"""
+    size = min(len(one), len(two))
+    return sum(int(a == b) for a, b in zip(one, two)) / size
+
+
+@functools.lru_cache(maxsize=1)
+def corpus_similarities() -> ({str: int}, [[float]]):
+    """Return the index of each string of the examples corpus, and the matrix
+    of pairwise similarities between them, computed once for the whole process"""
+    corpus = sorted(regex_match_examples())
+    index = {example: idx for idx, example in enumerate(corpus)}
+    matrix = [[1.] * len(corpus) for _ in corpus]
+    for idx, one in enumerate(corpus):
+        for jdx in range(idx + 1, len(corpus)):
+            matrix[idx][jdx] = matrix[jdx][idx] = similarity(one, corpus[jdx])
+    return index, matrix
+
+
+def diverse_examples(examples:iter, amount:int, seed:int=None) -> [str]:
+    """Return at most `amount` examples among given ones (that must belong to
+    the examples corpus), chosen to be as dissimilar as possible.
+
+    This is a greedy farthest-point selection: starting from the longest example
+    (or a random one if a seed is given), the example that is the least similar
+    to all already chosen ones is added, until there is enough of them.
+
+    """
+    index, matrix = corpus_similarities()
+    candidates = sorted(examples, key=lambda e: (-len(e), e))
+    if not amount or len(candidates) <= amount:
+        return candidates
+    first = candidates[0] if seed is None else random.Random(seed).choice(candidates)
+    chosen = [first]
+    # maximal similarity of each candidate with the chosen examples
+    closest = {cand: matrix[index[first]][index[cand]] for cand in candidates if cand != first}
+    while len(chosen) < amount:
+        best = min(closest, key=lambda cand: (closest[cand], -len(cand), cand))
+        chosen.append(best)
+        del closest[best]
+        row = matrix[index[best]]
+        for cand, value in closest.items():
+            closest[cand] = max(value, row[index[cand]])
+    return chosen
+
+
+def get_match_examples(regex:str, amount:int=3, seed:int=None) -> (str, str, str):
+    """Return a tuple of 3 strings matched by given regex
+
+    Strings of the examples corpus are preferred. Missing ones are synthesized
+    from the regex itself, which may find fewer of them for the most exotic
+    regexes (back references, for instance).
+    Results are cached by (regex, amount, seed), so that the same regex
+    is always documented with the same examples during a run.
+
+    """
+    prefetched = PREFETCHED_EXAMPLES.get((str(regex), int(amount))) if seed is None else None
+    if prefetched is not None:
+        return prefetched
+    return _get_match_examples(str(regex), int(amount), seed)
+
+
+@functools.lru_cache(maxsize=EXAMPLES_CACHE_SIZE)
+def _get_match_examples(regex:str, amount:int, seed:int or None) -> tuple:
+    matches = set(diverse_examples(corpus_matches(regex), amount, seed))
+
+    if amount and len(matches) < amount:  # Well, that's restrictive… Let's build some from the regex itself
+        from .regex_synthesis import synthesized_examples  # only needed for the few regexes not matching the corpus
+        with profiling.stage('example synthesis'):
+            missing = amount - len(matches)
+            matches.update([example for example in synthesized_examples(regex) if example not in matches][:missing])
+
+    return tuple(sorted(tuple(matches)))  # synthesis is deterministic too
 
 
 def doc_from_class(cls:object) -> str or None:
@@ -148,14 +236,22 @@ SPECIAL_REGEXES = {
 SPECIAL_REGEXES_REV = {v: k for k, v in SPECIAL_REGEXES.items()}
 
 
-def render_regex(regex:str, examples:iter=None) -> str:
-    """Render given regex in HTML"""
+@functools.lru_cache(maxsize=REGEX_CACHE_SIZE)
+def regex_id(regex:str) -> str:
+    """Return a short identifier of given regex"""
+    return hashlib.sha1(regex.encode()).hexdigest()[:10]
+
+
+def render_regex(regex:str, examples:iter=None, fmt:type=Markdown) -> str:
+    """Render given regex in given format, as a link to a regex tester"""
+    if REGEX_LINKS == 'local':
+        return fmt.link(fmt.code(f'/{regex}/'), '#regex-' + regex_id(regex))
     if not examples:  examples = tuple(get_match_examples(regex))
     from urllib import parse
     BASE_URL = "https://pythex.org/?regex={regex}&test_string={test}"
     regurl = BASE_URL.format(regex=parse.quote(regex),
                              test=parse.quote('\n'.join(examples)))
-    return f'[`/{regex}/`]({regurl})'
+    return fmt.link(fmt.code(f'/{regex}/'), regurl)
 
 
 def render_arpeggio_sequence(seq:arpeggio.Sequence) -> (str, (...)):
@@ -174,10 +270,11 @@ def render_arpeggio_sequence(seq:arpeggio.Sequence) -> (str, (...)):
         # print(print_obj(child))
         child_repr = child._tx_class.__name__ if hasattr(child, '_tx_class') else render_arpeggio_sequence(child)
         # exit()
+        sep = getattr(seq.sep, 'to_match', seq.sep)  # keep the tree free of arpeggio objects
         if isinstance(seq, arpeggio.ZeroOrMore):
-            return '0..*', child_repr, seq.sep
+            return '0..*', child_repr, sep
         elif isinstance(seq, arpeggio.OneOrMore):
-            return '1..*', child_repr, seq.sep
+            return '1..*', child_repr, sep
         assert isinstance(seq, arpeggio.Optional)
         return '0..1', child_repr
     elif isinstance(seq, arpeggio.RegExMatch):
@@ -189,66 +286,49 @@ def render_arpeggio_sequence(seq:arpeggio.Sequence) -> (str, (...)):
     return tuple(map(render_arpeggio_sequence, seq.nodes))
 
 
-def search_for_structure_info(textx_class, *, name=None, treated_classes:dict={}) -> (dict, dict):
+def search_for_structure_info(textx_class, *, name=None, treated_classes:dict=None) -> (dict, dict):
     """Return dict of infos found along the name of the class matching it,
     and dict mapping class name with content
 
+    Classes are walked with an explicit stack, so that arbitrarily deep
+    chains of rules are handled. Treated classes are kept in given dict,
+    or in a new one at each call.
+
     """
-    if textx_class in treated_classes:  # already treated
+    treated_classes = {} if treated_classes is None else treated_classes
+    todo = []  # (class, name) whose infos are still to be found
+
+    def infos_of(textx_class, name:str) -> dict:
+        "Return the (maybe not yet filled) dict of infos of given class"
+        if textx_class not in treated_classes:
+            treated_classes[textx_class] = {'names in parent': set()}
+            if hasattr(textx_class, '__name__'):  treated_classes[textx_class]['name'] = textx_class.__name__
+            todo.append((textx_class, name))
         if name:  treated_classes[textx_class]['names in parent'].add(name)
-        return treated_classes[textx_class], treated_classes
-    treated_classes[textx_class] = outdict = {'names in parent': set()}
-    if name:  outdict['names in parent'].add(name)
-    if hasattr(textx_class, '__name__'):  outdict['name'] = textx_class.__name__
-    regex = as_regex(textx_class)
-    if regex:
-        outdict['regex'] = name, regex
-    elif isinstance(textx_class, textx.metamodel.MetaAttr):
-        outdict['select'] = textx_class.mult, search_for_structure_info(textx_class.cls, name=name, treated_classes=treated_classes)[0]
-    elif not textx_class._tx_attrs and textx_class._tx_inh_by:  # it's a raw choice
-        outdict['choice'] = tuple(
-            search_for_structure_info(subclass, name=name, treated_classes=treated_classes)[0]
-            for subclass in textx_class._tx_inh_by
-        )
-        outdict['str'] = 'or', tuple(
-            treated_classes[subclass]['name']
-            for subclass in textx_class._tx_inh_by
-        )
-        outdict['doc'] = doc_from_class(textx_class)
-    elif textx_class.__name__ in {'STRING', 'INT', 'FLOAT', 'ID', 'BOOL', 'NUMBER'}:
-        outdict['type'] = textx_class
-    else:
-        outdict['children'] = []  # iterable of (name, structure)
-        outdict['str'] = render_arpeggio_sequence(textx_class._tx_peg_rule)
-        outdict['doc'] = doc_from_class(textx_class)
-
-
-        # if name:
-            # print('CLS:', name, textx_class)
-        # else:
-            # print('CLS:', textx_class)
-        # print('\t', type(textx_class).__name__ == 'TextXMetaClass', textx_class.__name__)
-        # print(dir(textx_class))
-        # print_obj(textx_class)
-        for name, obj in textx_class._tx_attrs.items():
-
-            # target = obj
-            # target = textx_class
-            # target = textx_class._tx_peg_rule.nodes[0]
-            target = textx_class._tx_peg_rule
-            # if isinstance(target, arpeggio.Sequence):
-                # for node in target.nodes:
-                    # if isinstance(node, arpeggio.StrMatch):
-                        # target = node
-                        # print()
-                        # print()
-                        # print()
-                        # print(target)
-                        # print(type(target))
-                        # print(dir(target))
-                        # print_obj(target)
-            outdict['children'].append((name, search_for_structure_info(obj, name=name, treated_classes=treated_classes)[0]))
-    return outdict, treated_classes
+        return treated_classes[textx_class]
+
+    root = infos_of(textx_class, name)
+    while todo:
+        textx_class, name = todo.pop()
+        outdict = treated_classes[textx_class]
+        regex = as_regex(textx_class)
+        if regex:
+            outdict['regex'] = name, regex
+        elif isinstance(textx_class, textx.metamodel.MetaAttr):
+            outdict['select'] = textx_class.mult, infos_of(textx_class.cls, name)
+        elif not textx_class._tx_attrs and textx_class._tx_inh_by:  # it's a raw choice
+            outdict['choice'] = tuple(infos_of(subclass, name) for subclass in textx_class._tx_inh_by)
+            outdict['str'] = 'or', tuple(treated_classes[subclass]['name'] for subclass in textx_class._tx_inh_by)
+            outdict['doc'] = doc_from_class(textx_class)
+        elif textx_class.__name__ in {'STRING', 'INT', 'FLOAT', 'ID', 'BOOL', 'NUMBER'}:
+            outdict['type'] = textx_class
+        else:
+            outdict['children'] = []  # iterable of (name, structure)
+            outdict['str'] = render_arpeggio_sequence(textx_class._tx_peg_rule)
+            outdict['doc'] = doc_from_class(textx_class)
+            for attr_name, obj in textx_class._tx_attrs.items():
+                outdict['children'].append((attr_name, infos_of(obj, attr_name)))
+    return root, treated_classes
 
 
 CHARS_AS_READABLE = {
@@ -341,36 +421,51 @@ def str_sequence_doc(sequence:tuple) -> [str]:
 
 
 
-def gen_doc(tree_model:dict, *, done_classes=set()) -> [str]:
+def gen_doc(tree_model:dict, *, done_classes:set=None) -> [str]:
     """Yield paragraph of mkd data
 
+    The tree is walked with an explicit stack, and the documented classes
+    are kept in given set, or in a new one at each call.
+
     TODO:
     - tooltips on class names and abstract rules: https://www.w3schools.com/howto/howto_css_tooltip.asp
 
     """
-    # print(tree_model)
-    if tree_model['name'] in done_classes:
-        return  # nothing to write
-    done_classes.add(tree_model['name'])
-    yield f"# {tree_model['name']}"
-    if 'regex' in tree_model:
-        yield from str_sequence_doc(('regex', tree_model['regex'][1]))
-    elif tree_model['name'] in SPECIAL_REGEXES:  # a base type
-        yield from str_sequence_doc(('special regex', tree_model['name']))
-    else:  # it's a regular rule
-        yield from str_sequence_doc(tree_model['str'])
-        if tree_model['doc']:  yield tree_model['doc']
-        # handle children
-        target = 'children' if 'children' in tree_model else 'choice'
-        for child in tree_model.get(target):
-            yield '\n\n<br/>\n\n'
-            if isinstance(child, tuple) and isinstance(child[1], dict) and 'select' in child[1]:
-                selection = child[1]['select']
-                if len(selection) == 2 and isinstance(selection[1], dict):
-                    child = selection[1]
-            yield from gen_doc(child, done_classes=done_classes)
-
-
+    done_classes = set() if done_classes is None else done_classes
+    stack = [iter([tree_model])]  # iterators over the models to document
+    while stack:
+        tree_model = next(stack[-1], None)
+        if tree_model is None:  # all children documented
+            stack.pop()
+            continue
+        if isinstance(tree_model, str):  # separator between children
+            yield tree_model
+            continue
+        if tree_model['name'] in done_classes:
+            continue  # nothing to write
+        done_classes.add(tree_model['name'])
+        yield f"# {tree_model['name']}"
+        if 'regex' in tree_model:
+            yield from str_sequence_doc(('regex', tree_model['regex'][1]))
+        elif tree_model['name'] in SPECIAL_REGEXES:  # a base type
+            yield from str_sequence_doc(('special regex', tree_model['name']))
+        else:  # it's a regular rule
+            yield from str_sequence_doc(tree_model['str'])
+            if tree_model['doc']:  yield tree_model['doc']
+            # handle children, documented before the siblings of the current model
+            target = 'children' if 'children' in tree_model else 'choice'
+            stack.append(_children_to_document(tree_model.get(target)))
+
+
+def _children_to_document(children:iter) -> iter:
+    """Yield the models of given children, after the separator of their doc"""
+    for child in children:
+        yield '\n\n<br/>\n\n'
+        if isinstance(child, tuple) and isinstance(child[1], dict) and 'select' in child[1]:
+            selection = child[1]['select']
+            if len(selection) == 2 and isinstance(selection[1], dict):
+                child = selection[1]
+        yield child
 
 
 if __name__ == '__main__':
@@ -0,0 +1,195 @@
+"""Intermediate representation (IR) of the textx rules.
+
+The arpeggio tree of a rule is walked once, and turned into nested tuples
+that hold only strings, so that all renderings of a rule can be derived
+from it without touching arpeggio again.
+
+Nodes are tuples whose first item gives the kind of node:
+
+    ('str', text)                       a raw string to type
+    ('regex', regex)                    a string matching a regex
+    ('special regex', name)             one of the textx base types (INT, ID…)
+    ('rule', name)                      a reference to another textx rule
+    ('choice', (node, …))               exactly one of the nodes
+    ('sequence', (node, …))             all nodes, in order
+    (mult, attr_name, node, sep)        repetition of a node, mult being one
+                                        of '0..1', '0..*' or '1..*'
+
+Sequences of only one node are replaced by that node.
+
+Nodes are hash-consed: structurally equal nodes are the same object,
+so that shared sub-structures (separated lists of identifiers,
+keywords choices, base types…) are stored and rendered only once.
+
+"""
+
+import sys
+import arpeggio
+import functools
+from textx.lang import BASE_TYPE_NAMES
+from .formats import Markdown
+from .render_utils import print_obj, render_regex, SPECIAL_REGEXES_REV, TIMED_OUT_REGEXES
+
+
+REPEAT_TO_MULT = {
+    arpeggio.Optional: '0..1',
+    arpeggio.ZeroOrMore: '0..*',
+    arpeggio.OneOrMore: '1..*',
+}
+MULT_TO_STR = {
+    '0..1': '?',
+    '0..*': '*',
+    '1..*': '+',
+}
+# bound of the caches of rendered nodes
+RENDER_CACHE_SIZE = 8192
+
+
+# all nodes built since the start of the process, or last call to clear_caches(),
+#  that long-running processes (watch, serve) call before loading a grammar again
+INTERNED_NODES = {}
+RENDER_CACHES = []  # functions decorated by cached_rendering
+
+
+def interned(*node) -> tuple:
+    """Return the unique node structurally equal to given one"""
+    node = tuple(sys.intern(item) if type(item) is str else item for item in node)
+    return INTERNED_NODES.setdefault(node, node)
+
+
+def reinterned(node:tuple) -> tuple:
+    """Return the interned node structurally equal to given one, that was
+    built elsewhere (like in the process that pickled it)"""
+    return interned(*(reinterned(item) if type(item) is tuple else item for item in node))
+
+
+def clear_caches():
+    """Forget all interned nodes and their renderings"""
+    INTERNED_NODES.clear()
+    for func in RENDER_CACHES:
+        func.cache_clear()
+
+
+def cached_rendering(func:callable) -> callable:
+    """Decorator caching the rendering (or any function) of IR nodes"""
+    func = functools.lru_cache(maxsize=RENDER_CACHE_SIZE)(func)
+    RENDER_CACHES.append(func)
+    return func
+
+
+def cached_regex_rendering(func:callable) -> callable:
+    """Decorator caching the rendering of IR nodes, also keyed by the regexes
+    of the node whose examples could not be computed in time, since they
+    are rendered differently (see example_pool module)"""
+    cached = cached_rendering(lambda node, timed_out, *args, **kwargs: func(node, *args, **kwargs))
+    @functools.wraps(func)
+    def rendering(node:tuple, *args, **kwargs):
+        timed_out = referenced_regexes(node) & TIMED_OUT_REGEXES if TIMED_OUT_REGEXES else frozenset()
+        return cached(node, timed_out, *args, **kwargs)
+    return rendering
+
+
+def ir_from_peg_rule(peg_rule, *, root:bool=True) -> tuple:
+    """Return the IR node describing given arpeggio tree.
+
+    Other rules met below the root are referenced by name, not described,
+    so that the IR of a rule doesn't grow with the rules it uses, and
+    recursive rules are handled. The textx base types are described.
+
+    """
+    rule_class = getattr(peg_rule, '_tx_class', None)
+    if not root and rule_class is not None and rule_class.__name__ not in BASE_TYPE_NAMES:
+        return interned('rule', rule_class.__name__)
+    describe = functools.partial(ir_from_peg_rule, root=False)
+    if isinstance(peg_rule, arpeggio.StrMatch):
+        return interned('str', peg_rule.to_match)
+    elif isinstance(peg_rule, arpeggio.RegExMatch):
+        if peg_rule.to_match in SPECIAL_REGEXES_REV:
+            return interned('special regex', SPECIAL_REGEXES_REV[peg_rule.to_match])
+        return interned('regex', peg_rule.to_match)
+    elif isinstance(peg_rule, tuple(REPEAT_TO_MULT)):
+        assert len(peg_rule.nodes) == 1
+        child = peg_rule.nodes[0]
+        if hasattr(child, '_tx_class'):  # it's applied on a known object
+            target = interned('rule', child._tx_class.__name__)
+        else:  # it's more complicated than that
+            target = describe(child)
+        sep = getattr(peg_rule, 'sep', None)
+        sep = getattr(sep, 'to_match', sep)  # keep the IR free of arpeggio objects
+        return interned(REPEAT_TO_MULT[type(peg_rule)], getattr(peg_rule, '_attr_name', ''), target, sep)
+    elif isinstance(peg_rule, arpeggio.OrderedChoice):
+        return interned('choice', interned(*map(describe, peg_rule.nodes)))
+    elif isinstance(peg_rule, arpeggio.Sequence):
+        nodes = interned(*map(describe, peg_rule.nodes))
+        if len(nodes) == 1:
+            return nodes[0]
+        return interned('sequence', nodes)
+    else:  # not a construct we know how to handle
+        print_obj(peg_rule)
+        raise ValueError(f"Unexpected arpeggio node '{peg_rule}' of type {type(peg_rule)}")
+
+
+@cached_regex_rendering
+def ir_as_str(node:tuple, fmt:type=Markdown, *, sep:str='  ') -> str:
+    """Return the EBNF-like one-line representation of given IR node in given
+    format, where items of sequences are joined with given separator"""
+    kind = node[0]
+    if kind == 'str':
+        return fmt.text(node[1])
+    elif kind == 'regex':
+        return render_regex(node[1], fmt=fmt)
+    elif kind in {'special regex', 'rule'}:
+        return fmt.link(node[1], '#' + node[1].lower())
+    elif kind == 'choice':
+        return '(' + '|'.join(ir_as_str(sub, fmt) for sub in node[1]) + ')'
+    elif kind == 'sequence':
+        return sep.join(ir_as_str(sub, fmt) for sub in node[1])
+    elif kind in MULT_TO_STR:
+        _, attr_name, target, sep = node
+        sep = fmt.text(f'[{sep}]') if sep else ''
+        return f'{attr_name}{MULT_TO_STR[kind]}={ir_as_str(target, fmt, sep=" ")}{sep}'
+    raise ValueError(f"Unexpected IR node '{node}'")
+
+
+@cached_rendering
+def referenced_rules(node:tuple) -> frozenset:
+    """Return the names of the rules referenced in given IR node"""
+    kind = node[0]
+    if kind == 'rule':
+        return frozenset((node[1],))
+    elif kind in {'choice', 'sequence'}:
+        return frozenset().union(*map(referenced_rules, node[1]))
+    elif kind in MULT_TO_STR:
+        return referenced_rules(node[2])
+    return frozenset()
+
+
+@cached_rendering
+def referenced_regexes(node:tuple) -> frozenset:
+    """Return the regexes (except the textx base types) found in given IR node"""
+    kind = node[0]
+    if kind == 'regex':
+        return frozenset((node[1],))
+    elif kind in {'choice', 'sequence'}:
+        return frozenset().union(*map(referenced_regexes, node[1]))
+    elif kind in MULT_TO_STR:
+        return referenced_regexes(node[2])
+    return frozenset()
+
+
+@cached_rendering
+def referenced_strings(node:tuple) -> frozenset:
+    """Return the literal strings (including separators) found in given IR node"""
+    kind = node[0]
+    if kind == 'str':
+        return frozenset((node[1],))
+    elif kind in {'choice', 'sequence'}:
+        return frozenset().union(*map(referenced_strings, node[1]))
+    elif kind in MULT_TO_STR:
+        return referenced_strings(node[2]) | (frozenset((node[3],)) if node[3] else frozenset())
+    return frozenset()
+
+
+def sequence_items(node:tuple) -> (tuple,):
+    """Return the nodes that a rule expects in order"""
+    return node[1] if node[0] == 'sequence' else (node,)
@@ -0,0 +1,97 @@
+"""Client-side search in the generated documentation.
+
+A SearchIndex is fed with the sections as they are rendered, and written
+as a small script defining an inverted index of the words found in rule
+names, docstrings and literal strings, and of the regexes. The search widget added
+at the end of the documentation loads it only when the search box is used.
+
+"""
+
+import os
+import re
+import html
+import json
+
+
+WORD = re.compile(r'\w+')
+WIDGET = r"""<div style="position:fixed;top:1em;right:1em;background:#fff;">
+<input id="dsldoc-search" type="search" placeholder="Search rules…" data-index="INDEX_SCRIPT"><ul id="dsldoc-results"></ul>
+</div>
+<script>
+(function () {
+  var input = document.getElementById('dsldoc-search'), results = document.getElementById('dsldoc-results');
+  input.addEventListener('focus', function () {
+    if (window.DSLDOC_SEARCH || document.getElementById('dsldoc-search-index')) return;
+    var script = document.createElement('script');
+    script.id = 'dsldoc-search-index';
+    script.src = input.dataset.index;
+    script.onload = search;
+    document.head.appendChild(script);
+  });
+  function search() {
+    var index = window.DSLDOC_SEARCH, scores = {};
+    results.innerHTML = '';
+    if (!index) return;
+    var words = input.value.toLowerCase().split(/\s+/).filter(Boolean);
+    words.forEach(function (word) {
+      var found = {};
+      Object.keys(index.terms).forEach(function (term) {
+        if (term.startsWith(word)) index.terms[term].forEach(function (doc) { found[doc] = 1; });
+      });
+      Object.keys(found).forEach(function (doc) { scores[doc] = (scores[doc] || 0) + 1; });
+    });
+    Object.keys(scores).sort(function (a, b) { return scores[b] - scores[a]; }).slice(0, 20).forEach(function (doc) {
+      var item = document.createElement('li'), link = document.createElement('a');
+      link.href = index.docs[doc][1];
+      link.textContent = index.docs[doc][0];
+      item.appendChild(link);
+      results.appendChild(item);
+    });
+  }
+  input.addEventListener('input', search);
+})();
+</script>"""
+
+
+class SearchIndex:
+    """Inverted index of the words of the sections given to add(),
+    linking to them with the url returned by given function.
+    The widget loads the index from given script url."""
+
+    def __init__(self, script:str, url_of:callable=lambda name: '#' + name.lower()):
+        self.script = script
+        self.url_of = url_of
+        self.docs = []  # [name, url] of each added section
+        self.terms = {}  # word -> ids of the sections containing it
+        self._added = set()
+
+    def add(self, section):
+        if section.name in self._added:  return  # the root may appear twice
+        self._added.add(section.name)
+        doc = len(self.docs)
+        self.docs.append([section.name, self.url_of(section.name)])
+        texts = [section.name, section.raw_doc or '', *section.strings]
+        words = {word.lower() for text in texts for word in WORD.findall(text)}
+        # operators and regexes are searched as a whole
+        words |= {string.lower() for string in section.strings if string.strip() and not WORD.fullmatch(string)}
+        words |= {regex.lower() for regex in section.regexes}
+        for word in words:
+            self.terms.setdefault(word, []).append(doc)
+
+    def as_script(self) -> str:
+        """Return the javascript defining the index"""
+        data = json.dumps({'docs': self.docs, 'terms': self.terms}, separators=(',', ':'), sort_keys=True)
+        return f'window.DSLDOC_SEARCH={data};\n'
+
+    def write(self, path:str):
+        with open(path, 'w') as fd:
+            fd.write(self.as_script())
+
+    def widget_lines(self) -> [str]:
+        """Return the html lines of the search box"""
+        return WIDGET.replace('INDEX_SCRIPT', html.escape(self.script)).splitlines()
+
+
+def index_script(output:str) -> str:
+    """Return the path of the search index script of given output file"""
+    return os.path.splitext(output)[0] + '.search.js'
@@ -0,0 +1,207 @@
+"""Local documentation server, rendering each rule only when its page is requested.
+
+The pages are those of the multi-page output (see pages module). Extracting
+the sections of a grammar is cheap compared to their rendering, so the server
+starts as soon as they are extracted, and renders a rule the first time its
+page is requested. Rendered sections are kept in a LRU indexed by their
+fingerprint, which also makes the ETag of their page: browsers revalidate
+the pages, and get a 304 response as long as the rule didn't change.
+
+When the grammar (or grammars it imports) is modified, the sections are
+extracted again. Unmodified rules keep their fingerprint, hence their
+rendering and their ETag.
+
+Since the rendering is done in a single thread, the examples of the regexes
+of a rule can be computed with a time budget before its rendering
+(see example_pool module), so that a pathological regex doesn't hold
+all the following requests. The pool computing them is started with
+the server, before any thread. A rule rendered without some examples
+is not kept in the LRU, and its page gets another ETag, so that it is
+rendered again once the grammar is reloaded.
+
+"""
+
+import time
+import html
+import asyncio
+import hashlib
+import collections
+from urllib.parse import unquote, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from .cache import file_mtimes
+from .formats import Html
+from .example_pool import ExamplePool, clear_prefetched
+from .pages import INDEX_PAGE, page_names, page_lines, index_lines
+from .regex_tester import ASSET, ASSET_NAME
+from .render_utils import TIMED_OUT_REGEXES
+from .rule_ir import clear_caches
+
+
+DEFAULT_CACHE_SIZE = 1024  # rendered sections kept in memory
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+HTML_TYPE = 'text/html; charset=utf-8'
+
+
+def etag_of(*parts:str) -> str:
+    return '"' + hashlib.sha1(''.join(parts).encode()).hexdigest()[:20] + '"'
+
+
+class DocServer:
+    """Serve the pages of the sections returned by given function,
+    loading them again when one of the files returned by the other
+    function is modified.
+
+    All the work on sections is done in a single thread, so that
+    the event loop stays responsive while a rule is rendered
+    or the grammar loaded.
+
+    """
+
+    def __init__(self, load:callable, files:callable, *, cache_size:int=DEFAULT_CACHE_SIZE,
+                 interval:float=0.5, example_timeout:float=None, example_workers:int=None,
+                 echo:callable=print):
+        self.load = load
+        self.files = files
+        self.cache_size = cache_size
+        self.example_timeout = example_timeout
+        # forked now, since the event loop and the executor will run threads
+        self.examples = ExamplePool(example_workers, replacement='spawn') if example_timeout else None
+        self.interval = interval
+        self.echo = echo
+        self.rendered = collections.OrderedDict()  # fingerprint -> html lines
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.mtimes, self.last_check = None, 0.
+        self.sections, self.pages, self.names_key = {}, {}, etag_of()
+        try:
+            self.check_grammar()
+        except BaseException:
+            self.close()
+            raise
+
+    def check_grammar(self):
+        """Load the sections again if the grammar files were modified since the last load.
+        On failure, the previous sections are kept"""
+        if time.monotonic() - self.last_check < self.interval:  return
+        self.last_check = time.monotonic()
+        current = file_mtimes(self.files())  # a missing file fails the load
+        if current == self.mtimes:  return
+        first_load, self.mtimes = self.mtimes is None, current
+        start = time.time()
+        clear_caches()  # don't keep the nodes of all versions of the grammar
+        clear_prefetched()
+        try:
+            sections = self.load()
+        except Exception as err:  # the grammar is probably being edited
+            if first_load:  raise
+            self.echo(f"Can't load the grammar: {err}")
+            return
+        unique = {}
+        for section in sections:  # the root may appear twice
+            unique.setdefault(section.name, section)
+        self.pages = page_names(unique)
+        self.sections = {self.pages[name]: section for name, section in unique.items()}
+        self.names_key = etag_of(*sorted(self.pages))  # links depend on the documented rules
+        self.mtimes = file_mtimes(self.files())  # the loaded files may differ
+        self.echo(f"{len(unique)} rules loaded in {time.time() - start:.2f}s")
+
+    def lines_of(self, section) -> [str]:
+        """Return the html lines of given section, rendering it if not in the LRU"""
+        key = section.fingerprint
+        if key in self.rendered:
+            self.rendered.move_to_end(key)
+            return self.rendered[key]
+        if self.examples:
+            self.examples.prefetch([section], timeout=self.example_timeout)
+        lines = list(section.lines(Html))
+        if section.regexes & TIMED_OUT_REGEXES:
+            return lines  # rendered without some examples, better luck after a reload
+        self.rendered[key] = lines
+        if len(self.rendered) > self.cache_size:
+            self.rendered.popitem(last=False)
+        return lines
+
+    def close(self):
+        """Stop the rendering thread and the processes computing examples"""
+        self.executor.shutdown()
+        if self.examples:
+            self.examples.close()
+
+    def respond(self, path:str, etags:{str}) -> (int, dict, bytes):
+        """Return status, headers and body of the response to a GET of given path,
+        given the ETags the client already has"""
+        self.check_grammar()
+        page = path.lstrip('/') or INDEX_PAGE
+        if page == INDEX_PAGE:
+            etag = self.names_key
+            content = lambda: '\n'.join(index_lines(self.sections.values(), self.pages))
+        elif page in self.sections:
+            section = self.sections[page]
+            etag = etag_of(section.fingerprint, self.names_key)
+            if etag not in etags:  # rendered now, to know if some examples are missing
+                lines = self.lines_of(section)
+                timed_out = section.regexes & TIMED_OUT_REGEXES
+                if timed_out:
+                    etag = etag_of(section.fingerprint, self.names_key, *sorted(timed_out))
+                content = lambda: '\n'.join(page_lines(section, lines, self.pages))
+        elif page == ASSET_NAME:
+            etag = etag_of(ASSET)
+            content = lambda: ASSET
+        else:
+            return 404, {'Content-Type': HTML_TYPE}, f'<p>No page {html.escape(page)}</p>'.encode()
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache',  # always revalidate
+                   'Content-Type': 'text/javascript' if page == ASSET_NAME else HTML_TYPE}
+        if etag in etags:
+            return 304, headers, b''
+        return 200, headers, content().encode()
+
+    async def handle(self, reader, writer):
+        """Answer the request of a client, then close the connection"""
+        try:
+            request = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1')
+                if not line.strip():  break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request) != 3:
+                status, out_headers, body = 400, {}, b''
+            elif request[0] not in {'GET', 'HEAD'}:
+                status, out_headers, body = 405, {'Allow': 'GET, HEAD'}, b''
+            else:
+                etags = {etag.strip() for etag in headers.get('if-none-match', '').split(',')}
+                path = unquote(urlsplit(request[1]).path)
+                loop = asyncio.get_running_loop()
+                try:
+                    status, out_headers, body = await loop.run_in_executor(self.executor, self.respond, path, etags)
+                except Exception as err:
+                    self.echo(f"Error while answering {path}: {err!r}")
+                    status, out_headers = 500, {'Content-Type': HTML_TYPE}
+                    body = f'<p>Error while rendering {html.escape(path)}: {html.escape(repr(err))}</p>'.encode()
+            out_headers.update({'Content-Length': str(len(body)), 'Connection': 'close'})
+            head = f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+            head += ''.join(f'{name}: {value}\r\n' for name, value in out_headers.items()) + '\r\n'
+            writer.write(head.encode('latin-1') + (body if request[:1] != ['HEAD'] else b''))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def serve(load:callable, files:callable, *, host:str='127.0.0.1', port:int=8000,
+          echo:callable=print, **options):
+    """Serve the documentation of the sections returned by given function,
+    loading them again each time one of the files returned by the other
+    function is modified, until interrupted. Options are given to DocServer"""
+    server = DocServer(load, files, echo=echo, **options)
+    async def main():
+        listener = await asyncio.start_server(server.handle, host, port)
+        echo(f"Serving documentation on http://{host}:{port}/ Interrupt with Ctrl-C.")
+        async with listener:
+            await listener.serve_forever()
+    try:
+        asyncio.run(main())
+    finally:
+        server.close()
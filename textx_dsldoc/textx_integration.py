@@ -1,11 +1,20 @@
 """Introduce DSLDoc as a textx subcommand.
 
+Since this module is loaded by every textx invocation, only what is needed
+to declare the subcommands is imported at module level. The rendering
+machinery is imported when a subcommand actually runs.
+
 """
 
 import os
+import re
+import sys
 import click
-import textx
-from .converters import markdown_from_metamodel, html_from_metamodel
+from . import profiling
+
+
+BATCH_INDEX = 'index'  # name of the index written by autodoc-batch
+
 
 @click.argument('target', type=click.Path(exists=True, dir_okay=False, readable=True))
                 # filename for a grammar in TextX format, or a python file defining a metamodel
@@ -16,17 +25,314 @@ from .converters import markdown_from_metamodel, html_from_metamodel
 @click.option('-o', '--output', default='out.html',
               type=click.Path(dir_okay=False, writable=True),
               help='directory to populate with resulting HTML or markdown, depending of the extension')
-def autodoc(target:str, metamodel:str, import_target:bool, output:str):
+@click.option('--reachable-only', is_flag=True, default=False,
+              help='document only the rules reachable from the root rule, in breadth-first order')
+@click.option('-e', '--entry', 'entries', type=str, multiple=True,
+              help='document only the rules reachable from given rule (can be repeated, implies --reachable-only)')
+@click.option('--cache-dir', default=None,
+              type=click.Path(file_okay=False, writable=True),
+              help='directory keeping extracted grammars and rendered sections, so that only modified rules are handled again')
+@click.option('--cache-size', type=click.IntRange(min=0), default=None,
+              help='maximal size of the cache directory, in MB (default: 100)')
+@click.option('--stream', is_flag=True, default=False,
+              help='write the documentation section by section, keeping memory usage flat')
+@click.option('--pages', 'pages_dir', default=None, type=click.Path(file_okay=False, writable=True),
+              help='instead of output, write in given directory one html page per rule, and an index')
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=1,
+              help='number of processes rendering the documentation')
+@click.option('--search', is_flag=True, default=False,
+              help='add a search box, using an index written next to the output')
+@click.option('--minify', is_flag=True, default=False,
+              help='remove insignificant spaces from the html')
+@click.option('--compress', is_flag=True, default=False,
+              help='also write the output compressed with gzip (.gz), and brotli (.br) if installed')
+@click.option('--regex-links', type=click.Choice(['pythex', 'local']), default='pythex',
+              help='link regexes to pythex.org, or to a local regex tester written next to the output')
+@click.option('--example-timeout', type=click.FloatRange(min=0), default=None,
+              help='seconds allowed to compute the examples of each regex, in a pool of processes'
+                   ' (0: compute them during rendering, without limit; the default, except with --serve)')
+@click.option('--example-workers', type=click.IntRange(min=1), default=None,
+              help='number of processes computing the examples of regexes (default: one per CPU)')
+@click.option('--profile', is_flag=True, default=False,
+              help='report time, calls and memory peak of each stage, and the slowest rules')
+@click.option('--profile-json', default=None, type=click.Path(dir_okay=False, writable=True),
+              help='write the profiling report in given JSON file (implies --profile)')
+@click.option('-w', '--watch', 'watch_target', is_flag=True, default=False,
+              help='regenerate the documentation each time the target is modified')
+@click.option('--watch-interval', type=float, default=0.5,
+              help='delay between two checks of the target modification, in seconds')
+@click.option('--serve', is_flag=True, default=False,
+              help='instead of output, serve the pages of the rules over http, rendering them when first requested')
+@click.option('--host', default='127.0.0.1', help='address the server listens on')
+@click.option('--port', type=click.IntRange(min=0, max=65535), default=8000, help='port the server listens on')
+def autodoc(target:str, metamodel:str, import_target:bool, output:str, reachable_only:bool, entries:[str],
+            cache_dir:str, cache_size:int,
+            stream:bool, pages_dir:str, jobs:int, search:bool, minify:bool, compress:bool, regex_links:str, example_timeout:float, example_workers:int,
+            profile:bool, profile_json:str, watch_target:bool, watch_interval:float,
+            serve:bool, host:str, port:int):
     """Subcommand added to textx. Will search for given grammar or metamodel,
     and generate its doc.
 
     """
     click.echo(f"\n\nBEGINNING…")
     click.echo(f"{target}\t\t{metamodel}")
+    if regex_links != 'pythex':
+        from .regex_tester import set_regex_links
+        set_regex_links(regex_links)
+    if watch_target:
+        from .watch import watch
+        reject_options('--watch', {'--serve': serve, '--pages': pages_dir, '--search': search, '--minify': minify,
+                                   '--compress': compress, '--stream': stream, '--jobs': jobs > 1,
+                                   '--example-timeout': example_timeout, '--profile': profile or profile_json})
+        click.echo(f"Watching {target}, writing {output}. Interrupt with Ctrl-C.")
+        try:
+            watch(target, output, metamodel=metamodel, import_target=import_target,
+                  interval=watch_interval, echo=click.echo, cache_dir=cache_dir,
+                  reachable_only=reachable_only, entries=entries)
+        except KeyboardInterrupt:
+            pass
+        if cache_dir:
+            bound_cache(cache_dir, cache_size)
+        return
+    if serve:
+        from .server import serve as serve_documentation
+        from .cache import grammar_files
+        reject_options('--serve', {'--pages': pages_dir, '--search': search, '--minify': minify,
+                                   '--compress': compress, '--stream': stream, '--jobs': jobs > 1,
+                                   '--profile': profile or profile_json})
+        watched = set(grammar_files(target))
+        def load() -> list:
+            loaded = set()
+            sections = load_sections(target, metamodel, import_target, cache_dir=cache_dir, files=loaded,
+                                     reachable_only=reachable_only, entries=entries)
+            watched.clear()
+            watched.update(loaded)  # python targets may load grammars
+            return sections
+        try:
+            if example_timeout is None:
+                from .example_pool import DEFAULT_TIMEOUT
+                example_timeout = DEFAULT_TIMEOUT  # a slow regex would hold all the requests
+            serve_documentation(load, lambda: watched, host=host, port=port, echo=click.echo,
+                                example_timeout=example_timeout, example_workers=example_workers)
+        except KeyboardInterrupt:
+            pass
+        if cache_dir:
+            bound_cache(cache_dir, cache_size)
+        return
+    if profile or profile_json:
+        from .profiling import Profiler
+        profiler = Profiler().enable()
+    with profiling.stage('load'):
+        sections = load_sections(target, metamodel, import_target, cache_dir=cache_dir,
+                                 reachable_only=reachable_only, entries=entries)
+    click.echo("Generating documentation…")
+    if pages_dir:
+        from .pages import write_pages
+        written, total = write_pages(sections, pages_dir, minify=minify, compress=compress, search=search,
+                                     cache_dir=cache_dir, jobs=jobs,
+                                     example_timeout=example_timeout, example_workers=example_workers)
+        click.echo(f"{written}/{total} pages written in {pages_dir}")
+    else:
+        click.echo(output)
+        search_index = None
+        if search:
+            from .search import SearchIndex, index_script
+            search_index = SearchIndex(os.path.basename(index_script(output)))
+        files = write_documentation(sections, output, stream=stream, cache_dir=cache_dir, jobs=jobs,
+                                    minify=minify, compress=compress, search_index=search_index,
+                                    example_timeout=example_timeout, example_workers=example_workers)
+        if search:
+            search_index.write(index_script(output))
+        if minify or compress:
+            for line in files.report():
+                click.echo(line)
+    if profile or profile_json:
+        profiler.disable()
+        if jobs > 1:
+            click.echo("Note: rendering done in worker processes is not profiled")
+        for line in profiler.report():
+            click.echo(line)
+        if profile_json:
+            import json
+            with open(profile_json, 'w') as fd:
+                json.dump(profiler.as_dict(), fd, indent=2)
+    if stream:
+        click.echo(f"Peak memory usage: {peak_memory() / 2**20:.1f} MB")
+    if cache_dir:
+        bound_cache(cache_dir, cache_size)
+
+
+@click.argument('targets', nargs=-1, type=click.Path(exists=True, dir_okay=False, readable=True))
+@click.option('-l', '--language', 'languages', type=str, multiple=True,
+              help='name of a registered textx language to document (can be repeated)')
+@click.option('-a', '--all-languages', is_flag=True, default=False,
+              help='document all languages registered in textx')
+@click.option('-m', '--metamodel', type=str, default='metamodel',
+              help='if a target is a python file, name of the variable accessing the metamodel')
+@click.option('-o', '--output-dir', default='autodoc',
+              type=click.Path(file_okay=False, writable=True),
+              help='directory to populate with one documentation file per target or language')
+@click.option('-f', '--format', 'fmt', type=click.Choice(['html', 'md']), default='html',
+              help='format of the generated documentation')
+@click.option('--cache-dir', default=None,
+              type=click.Path(file_okay=False, writable=True),
+              help='directory keeping extracted grammars and rendered sections, so that only modified rules are handled again')
+@click.option('--cache-size', type=click.IntRange(min=0), default=None,
+              help='maximal size of the cache directory, in MB (default: 100)')
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=1,
+              help='number of processes documenting the targets and languages')
+@click.option('--regex-links', type=click.Choice(['pythex', 'local']), default='pythex',
+              help='link regexes to pythex.org, or to a local regex tester written next to the output')
+def autodoc_batch(targets:[str], languages:[str], all_languages:bool, metamodel:str,
+                  output_dir:str, fmt:str, cache_dir:str, cache_size:int, jobs:int, regex_links:str):
+    """Subcommand added to textx. Generate the doc of all given grammars,
+    metamodels and registered languages in one process, sharing caches
+    between them.
+
+    """
+    if all_languages:
+        languages = registered_languages()
+    else:
+        check_languages(languages)
+    todo = [('target', target) for target in targets] + [('language', lang) for lang in languages]
+    if not todo:
+        raise click.UsageError("Nothing to document: give targets, languages or --all-languages")
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = [os.path.join(output_dir, f'{outname}.{fmt}') for outname in output_names(todo)]
+    tasks = [(kind, name, output, metamodel, cache_dir, regex_links) for (kind, name), output in zip(todo, outputs)]
+    if jobs == 1 or len(tasks) == 1:
+        for (kind, name), output in zip(todo, map(document_one, tasks)):
+            click.echo(f"{kind} {name} documented in {output}")
+    else:  # each worker keeps its caches warm between the tasks it handles
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for (kind, name), output in zip(todo, pool.map(document_one, tasks)):
+                click.echo(f"{kind} {name} documented in {output}")
+    index = os.path.join(output_dir, f'{BATCH_INDEX}.{fmt}')
+    with open(index, 'w') as fd:
+        fd.write(batch_index(todo, outputs, fmt))
+    click.echo(f"Index written in {index}")
+    if cache_dir:
+        bound_cache(cache_dir, cache_size)
+
+
+def reject_options(mode:str, options:{str: object}):
+    """Raise click.UsageError if one of given options {name: value},
+    that can't be used in given mode, is set"""
+    given = [name for name, value in options.items() if value]
+    if given:
+        raise click.UsageError(f"{', '.join(given)} can't be used with {mode}")
+
+
+def output_names(todo:[(str, str)]) -> [str]:
+    """Return the name of the output of each given (kind, target or language),
+    all distinct (case-insensitively) and distinct from the index"""
+    names, taken = [], {BATCH_INDEX}
+    for kind, name in todo:
+        basename = os.path.splitext(os.path.basename(name))[0] if kind == 'target' else name
+        outname, idx = basename, 1
+        while outname.lower() in taken:  # two targets with the same name in different directories
+            outname, idx = f'{basename}-{idx}', idx + 1
+        taken.add(outname.lower())
+        names.append(outname)
+    return names
+
+
+def batch_index(todo:[(str, str)], outputs:[str], fmt:str) -> str:
+    """Return the index linking to given outputs, in given format (html or md)"""
+    from .formats import Html, Markdown
+    lines = []
+    for (kind, name), output in zip(todo, outputs):
+        link = os.path.basename(output)
+        if fmt == 'html':
+            lines.append(f'<p>{Html.link(Html.text(name), link)}</p>')
+        else:
+            lines.append('- ' + Markdown.link(re.sub(r'([\\\[\]])', r'\\\1', name), link))
+    return ''.join(line + '\n' for line in lines)
+
+
+def document_one(job:tuple) -> str:
+    """Write documentation of given target or language, and return the output file"""
+    import textx
+    from .converters import doc_sections
+    from .regex_tester import set_regex_links
+    kind, name, output, metamodel_name, cache_dir, regex_links = job
+    set_regex_links(regex_links)
+    if kind == 'language':
+        sections = list(doc_sections(textx.metamodel_for_language(name)))
+    else:
+        sections = load_sections(name, metamodel_name, cache_dir=cache_dir)
+    write_documentation(sections, output, cache_dir=cache_dir)
+    return output
+
+
+def registered_languages() -> [str]:
+    """Return names of the languages registered in textx, except the textx
+    grammar language itself"""
+    import textx
+    if not hasattr(textx, 'language_descriptions'):
+        raise click.UsageError("Registered languages discovery needs textX 2.0 or later")
+    return sorted(name for name in textx.language_descriptions() if name != 'textx')
+
+
+def check_languages(languages:[str]):
+    """Raise click.UsageError if one of given languages is not a registered
+    language that can be documented"""
+    if not languages:  return
+    known = registered_languages()
+    unknown = [name for name in languages if name.lower() not in known]  # textx ignores the case
+    if unknown:
+        raise click.UsageError(f"Unknown languages: {', '.join(unknown)}"
+                               f" (registered: {', '.join(known) or 'none'})")
+
+
+def load_sections(target:str, metamodel:str='metamodel', import_target:bool=False, *,
+                  cache_dir:str=None, files:set=None, **options) -> list:
+    """Return the documentation sections of the metamodel defined by given target.
+    Options are given to converters.doc_sections.
+
+    If cache_dir is given, the sections are kept in it, and the metamodel
+    is only built again if the target (or grammars it loads) changed.
+    If files is given, it is filled with the grammar files the sections
+    were extracted from, target included.
+
+    """
+    from .cache import SectionsCache, grammar_files, metamodel_files
+    from .converters import doc_sections, UnknownRuleError
+    def build() -> (list, [str]):
+        model = load_metamodel(target, metamodel, import_target)
+        try:
+            return list(doc_sections(model, **options)), list(metamodel_files(model))
+        except UnknownRuleError as err:
+            raise click.UsageError(str(err))
+    if not cache_dir:
+        sections, loaded = build()
+    else:
+        cache = SectionsCache(cache_dir)
+        key = cache.key_of(target, metamodel, import_target, *sorted(options.items()))
+        found = cache.get(key)
+        if found is None:
+            sections, loaded = build()
+            cache.put(key, sections, loaded)
+        else:
+            click.echo(f"Grammar found in cache")
+            sections, loaded = found
+    if files is not None:
+        files.update(grammar_files(target), loaded)
+    return sections
+
+
+def load_metamodel(target:str, metamodel:str='metamodel', import_target:bool=False):
+    """Return the metamodel defined by given grammar file, or held by given
+    variable of given python file"""
+    import textx
+    import importlib.util
     if os.path.splitext(target)[1] == '.py':
         if import_target:
-            module = importlib.import_module(target)
-            metamodel = getattr(module, var_metamodel)
+            spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(target))[0], target)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            metamodel = getattr(module, metamodel)
         else:  # use the good old exec()
             with open(target) as fd:
                 pycode = fd.read()
@@ -37,8 +343,54 @@ def autodoc(target:str, metamodel:str, import_target:bool, output:str):
     else:  # let's hope it's a grammar
         click.echo(f"Found a grammar in target")
         metamodel = textx.metamodel_from_file(target)
-    click.echo("Generating documentation…")
-    click.echo(output)
-    converter = html_from_metamodel if os.path.splitext(output)[1] in {'.htm', '.html'} else markdown_from_metamodel
-    with open(output, 'w') as fd:
-        fd.write(converter(metamodel))
+    return metamodel
+
+
+def write_documentation(metamodel, output:str, *, stream:bool=False, minify:bool=False,
+                        compress:bool=False, **options):
+    """Write documentation of given metamodel (or its sections) in given file,
+    in html or markdown depending of its extension. Options are given to the converter.
+
+    minify -- remove insignificant spaces of the html (markdown is left untouched).
+    compress -- also write the .gz (and .br if brotli is installed) versions.
+
+    Return the artifacts.OutputFiles that wrote the files.
+
+    """
+    from .artifacts import OutputFiles
+    from .converters import markdown_from_metamodel, html_from_metamodel, markdown_chunks, html_chunks
+    from .regex_tester import write_asset
+    from .formats import Html, format_of
+    as_html = format_of(output) is Html
+    files = OutputFiles(output, minify=minify and as_html, compress=compress)
+    if stream:
+        chunks = (html_chunks if as_html else markdown_chunks)(metamodel, **options)
+        with files:
+            for chunk in chunks:
+                with profiling.stage('write'):
+                    files.write(chunk)
+                    files.flush()  # let readers of a pipe get the sections as they come
+    else:
+        converter = html_from_metamodel if as_html else markdown_from_metamodel
+        content = converter(metamodel, **options)
+        with profiling.stage('write'), files:
+            files.write(content)
+    write_asset(output)
+    return files
+
+
+def bound_cache(cache_dir:str, size:int=None):
+    """Evict old files of given cache directory until its size is below
+    given number of MB (or the default size)"""
+    from .cache import evict, DEFAULT_CACHE_SIZE
+    evict(cache_dir, DEFAULT_CACHE_SIZE if size is None else size * 2**20)
+
+
+def peak_memory() -> int:
+    """Return the peak resident set size of the process, in bytes, or 0 if unknown"""
+    try:
+        import resource
+    except ImportError:  # not a unix system
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # linux gives kB
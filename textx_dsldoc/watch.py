@@ -0,0 +1,68 @@
+"""Regeneration of the documentation each time the grammar is modified.
+
+"""
+
+import time
+from .cache import FragmentCache, grammar_files, file_mtimes, write_atomically
+from .formats import Markdown, format_of
+
+
+def watch(target:str, output:str, *, metamodel:str='metamodel', import_target:bool=False,
+          interval:float=0.5, echo:callable=print, cache_dir:str=None, **options):
+    """Write documentation of given target in given output file, then
+    write it again each time the target (or grammars it loads) is modified,
+    until interrupted. Options are given to converters.doc_sections.
+
+    Only the sections that changed, or that reference a changed section,
+    are rendered again. If cache_dir is given, the sections and their
+    rendering are also kept in it, as done by textx_integration.autodoc.
+
+    """
+    from .textx_integration import load_sections  # avoid circular import
+    from .regex_tester import document_end, write_asset
+    from .rule_ir import clear_caches
+    fmt = format_of(output)
+    cache = FragmentCache(cache_dir, fmt) if cache_dir else None
+    mtimes, rendered, watched = None, {}, set(grammar_files(target))
+    while True:
+        current = file_mtimes(watched)
+        if current != mtimes:
+            mtimes = current
+            start = time.time()
+            clear_caches()  # don't keep the nodes of all versions of the grammar
+            try:
+                loaded = set()
+                sections = load_sections(target, metamodel, import_target, cache_dir=cache_dir,
+                                         files=loaded, **options)
+                new_rendering, nb_rendered = update_rendering(sections, rendered, fmt, cache)
+                lines = [line for section in sections for line in new_rendering[section.name][1]]
+                write_atomically(output, '\n'.join(lines + document_end(sections)))
+                write_asset(output)
+            except Exception as err:  # the grammar is probably being edited
+                echo(f"Can't document {target}: {err}")
+            else:
+                rendered = new_rendering
+                watched = loaded  # python targets may load grammars
+                mtimes = file_mtimes(watched)
+                echo(f"{nb_rendered}/{len(sections)} sections rendered in {time.time() - start:.2f}s")
+        time.sleep(interval)
+
+
+def update_rendering(sections:list, previous:dict, fmt:type=Markdown, cache:FragmentCache=None) -> (dict, int):
+    """Return the map {name: (fingerprint, lines)} describing given sections,
+    reusing the previous map for the sections that are still valid,
+    and the number of rendered sections. Sections to render
+    are first looked up in given cache, if any"""
+    names = {section.name for section in sections}
+    changed = {section.name for section in sections
+               if previous.get(section.name, (None,))[0] != section.fingerprint}
+    changed |= set(previous) - names  # removed rules
+    rendered = {}
+    for section in sections:
+        if section.name in rendered:  continue  # the root may appear twice
+        if section.name in changed or section.references & changed:
+            lines = cache.lines_of(section) if cache else list(section.lines(fmt))
+            rendered[section.name] = section.fingerprint, lines
+        else:
+            rendered[section.name] = previous[section.name]
+    return rendered, sum(1 for name in rendered if rendered[name] is not previous.get(name))